@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""Scaling benchmark of the parallel DOCX appendix build.
+
+Description:
+    Builds the full appendix (hostnames, listening services and Dehashed
+    users) for a synthetic scan from Benchmarks.generators, once per --jobs
+    value, and reports the wall time and speedup over one process. The
+    document.xml of every run must be identical to the single process one,
+    otherwise the script exits non-zero.
+
+    Example:
+        python3 -m Benchmarks.bench_appendix --hosts 50000 --jobs 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from argparse import Namespace
+
+from docx import Document
+
+import nmapParse
+from Benchmarks.generators import write_dehashed, write_nmap_xml
+from Modules.generateAppendix import DOCUMENT_XML, AppendixGenerator
+from Modules.hostnameIndex import HostnameIndex
+from Modules.indexes import IndexedList
+from Modules.ipIndex import IPIndex
+from Modules.parseDehashed import ParseDehashed
+from Modules.reducers import Reducers
+
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Template',
+                        'appendix.docx')
+
+
+def build(options, jobs, dehashed_dict, ips, ports, index):
+    """Builds ./appendix/appendix.docx with this many worker processes.
+
+    Returns:
+        The wall time and the document.xml of the result.
+    """
+    run_options = Namespace(files=['scan.xml'], db=None, dehashed=['dehashed.json'], jobs=jobs)
+    start = time.perf_counter()
+    AppendixGenerator(run_options).export_doc(dehashed_dict, ips, ports,
+                                              Document(options.template), index)
+    elapsed = time.perf_counter() - start
+    with zipfile.ZipFile('./appendix/appendix.docx') as docx:
+        return elapsed, docx.read(DOCUMENT_XML)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the parallel appendix build')
+    parser.add_argument('--hosts', dest='hosts', type=int, default=20000,
+                        help='Hosts in the synthetic scan')
+    parser.add_argument('--entries-per-host', dest='entries_per_host', type=int, default=1,
+                        help='Dehashed entries generated per host')
+    parser.add_argument('--jobs', dest='jobs', type=int, nargs='+', default=[1, 2, 4],
+                        help='Worker process counts to time')
+    parser.add_argument('--template', dest='template', default=TEMPLATE,
+                        help='The appendix template')
+    parser.add_argument('--seed', dest='seed', type=int, default=1,
+                        help='Seed for the generators')
+    options = parser.parse_args()
+    options.template = os.path.abspath(options.template)
+    print(f"{os.cpu_count()} CPU(s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        write_nmap_xml('scan.xml', options.hosts, seed=options.seed)
+        write_dehashed('dehashed.json', options.hosts * options.entries_per_host,
+                       options.seed)
+        parse_options = Namespace(stream=True, follow=False, verbose=False)
+        ips, ports = HostnameIndex(), {}
+        nmapParse.NParse('scan.xml', parse_options).populate_dictionaries(ips, ports, Reducers())
+        dehashed_dict = {}
+        ParseDehashed('dehashed.json', parse_options).parse_dehashed_json(
+            dehashed_dict, IndexedList(), IndexedList())
+        index = IPIndex(ips)
+        rows = len(ips) + sum(len(records) for records in ports.values()) + len(dehashed_dict)
+        print(f"{options.hosts} hosts, {rows} appendix rows")
+
+        failed = False
+        baseline = expected = None
+        for jobs in options.jobs:
+            elapsed, xml = build(options, jobs, dehashed_dict, ips, ports, index)
+            baseline = baseline or elapsed
+            expected = expected or xml
+            status = "" if xml == expected else "  (document differs)"
+            failed = failed or bool(status)
+            print(f"{jobs:>3} job(s): {elapsed:8.2f}s  {baseline / elapsed:5.2f}x{status}")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""Regression benchmark for the dedup in NParse.populate_dictionaries.
+
+Description:
+    Times populate_dictionaries on synthetic hosts for a growing number of
+    open ports, once with thousands of ports on a single host and once with a
+    single service spread over many hosts. Every host is fed in twice so the
+    duplicate checks are exercised as well. The time per port should stay
+    roughly constant; if it grows with the input size, dedup went quadratic
+    again and the script exits non-zero.
+
+    Example:
+        python3 -m Benchmarks.bench_dedup
+"""
+
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from nmapParse import NParse
+from Modules.hostnameIndex import HostnameIndex
+from Modules.reducers import Reducers
+from Modules.streamParse import StreamHost
+
+
+SIZES = [2000, 4000, 8000, 16000, 32000]
+# Allowed growth of the per-port cost between the smallest and largest size
+MAX_GROWTH = 3.0
+
+
+class SyntheticParse(NParse):
+    """NParse fed from prebuilt hosts, so only populate_dictionaries is timed"""
+
+    def __init__(self, hosts):
+        super().__init__(None)
+        self.hosts = hosts
+
+    def get_hosts(self):
+        return self.hosts
+
+
+def make_host(ip, ports):
+    port_xml = "".join(
+        f'<port protocol="tcp" portid="{port}"><state state="open" reason="syn-ack"/>'
+        f'<service name="http" product="nginx" version="1.{port % 7}" method="probed" conf="10"/></port>'
+        for port in ports)
+    element = ET.fromstring(
+        f'<host><address addr="{ip}" addrtype="ipv4"/><hostnames/><ports>{port_xml}</ports></host>')
+    return StreamHost(element)
+
+
+def wide_host(n):
+    """One host with n open ports"""
+    host = make_host("10.0.0.1", range(1, n + 1))
+    return [host, host]
+
+
+def many_hosts(n):
+    """n hosts that all run the same service"""
+    hosts = [make_host(f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", [80])
+             for i in range(n)]
+    return hosts + hosts
+
+
+def run(name, build):
+    print(f"---{name}---")
+    per_port = []
+    for n in SIZES:
+        hosts = build(n)
+        start = time.perf_counter()
+        SyntheticParse(hosts).populate_dictionaries(HostnameIndex(), {}, Reducers())
+        elapsed = time.perf_counter() - start
+        per_port.append(elapsed / n)
+        print(f"{n:>8} ports  {elapsed:8.3f}s  {per_port[-1] * 1e6:8.2f}us/port")
+    growth = per_port[-1] / per_port[0]
+    print(f"Per-port growth x{growth:.2f} over a x{SIZES[-1] // SIZES[0]} larger input\n")
+    return growth
+
+
+if __name__ == '__main__':
+    growth = max(run("Many ports on one host", wide_host),
+                 run("One service on many hosts", many_hosts))
+    if growth > MAX_GROWTH:
+        print(f"[!] Dedup is no longer linear (x{growth:.2f} > x{MAX_GROWTH})")
+        sys.exit(1)
+    print("[+] Dedup scales linearly")
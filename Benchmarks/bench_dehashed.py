@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""Benchmark of ParseDehashed on a synthetic Dehashed export.
+
+Description:
+    Writes a synthetic Dehashed JSON export with the given number of entries
+    and times the streaming parser on it, recording peak memory with
+    tracemalloc. --legacy also times the old json.load() parser with list
+    based dedup; it is quadratic, so keep --entries small when using it.
+
+    Example:
+        python3 -m Benchmarks.bench_dehashed --entries 1000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from Benchmarks.generators import write_dehashed
+from Modules.indexes import IndexedList
+from Modules.parseDehashed import ParseDehashed
+
+
+def legacy_parse(path):
+    """The json.load() parser with list scans that ParseDehashed used to be"""
+    breached, password_spray, credential_stuffing = {}, [], []
+    with open(path) as json_file:
+        for user in json.load(json_file)['entries']:
+            email = user['email'].split(';')[0].strip()
+            password, password_hash = user['password'], user['hashed_password']
+            usr = email.split('@')[0].strip()
+            if usr not in password_spray:
+                password_spray.append(usr)
+            if password != '' or password_hash != '':
+                creds = breached.setdefault(email, {'password': set(), 'username': set(),
+                                                    'hash': set(), 'database': set()})
+                creds['password'].add(password)
+                creds['username'].add(user['username'])
+                creds['hash'].add(password_hash)
+                creds['database'].add(user['database_name'])
+                if password != '' and (usr, password) not in credential_stuffing:
+                    credential_stuffing.append((usr, password))
+
+
+def streaming_parse(path):
+    ParseDehashed(path, None).parse_dehashed_json({}, IndexedList(), IndexedList())
+
+
+def measure(parse, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    parse(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Dehashed parser')
+    parser.add_argument('--entries', dest='entries', type=int, default=1000000,
+                        help='Number of entries in the synthetic export')
+    parser.add_argument('--legacy', dest='legacy', action='store_true',
+                        help='Also time the old quadratic parser')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dehashed.json')
+        write_dehashed(path, options.entries)
+        size = os.path.getsize(path) / 2**20
+        print(f"{options.entries} entries, {size:.1f} MiB")
+        runs = [("streaming", streaming_parse)]
+        if options.legacy:
+            runs.append(("legacy", legacy_parse))
+        for name, parse in runs:
+            elapsed, peak = measure(parse, path)
+            print(f"{name:>10}: {elapsed:8.2f}s  peak {peak / 2**20:8.1f} MiB")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""Benchmark of the bulk DOCX table writer against the old per-cell path.
+
+Description:
+    Builds an Appendix II style table (6 columns) with a growing number of
+    rows, once through python-docx add_row()/add_run() with per-cell
+    formatting, the way AppendixGenerator used to, and once the way
+    export_doc does now: rows rendered in chunks by
+    Modules.tableWriter.rows_xml and spliced into the saved file. Both
+    documents are saved so the time to serialize the table is included.
+
+    Example:
+        python3 -m Benchmarks.bench_docx --rows 1000 10000 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+from lxml import etree
+
+from Modules.generateAppendix import TABLE_STYLE, chunked, splice
+from Modules.tableWriter import cell_prefixes, rows_xml
+
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), '..', 'Template', 'appendix.docx')
+
+
+def synthetic_rows(n):
+    for i in range(n):
+        yield (f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", str(i % 1000),
+               "tcp", "http", "nginx", f"1.{i % 25}")
+
+
+def new_table(template):
+    document = Document(template) if os.path.exists(template) else Document()
+    table = document.add_table(rows=1, cols=6)
+    if os.path.exists(template):
+        table.style = TABLE_STYLE
+    return document, table
+
+
+def per_cell(document, table, rows, out):
+    """The row loop AppendixGenerator.export_doc used before the bulk writer"""
+    for values in rows:
+        row = table.add_row().cells
+        run = row[0].paragraphs[0].add_run(values[0])
+        run.font.bold = False
+        for cell, value in zip(row[1:], values[1:]):
+            cell.paragraphs[0].add_run(value)
+        for r in row:
+            r.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            r.paragraphs[0].paragraph_format.space_before = Pt(2)
+            r.paragraphs[0].paragraph_format.space_after = Pt(2)
+    document.save(out)
+
+
+def bulk(document, table, rows, out):
+    """Rendered row chunks spliced into the saved file, like export_doc"""
+    prefixes = cell_prefixes(table)
+    table._tbl.append(etree.Comment('appendix:rows'))
+    chunks = (rows_xml(prefixes, chunk) for chunk in chunked(rows))
+    splice(document, {'rows': chunks}, out)
+
+
+def timed(build, n, template, out):
+    document, table = new_table(template)
+    start = time.perf_counter()
+    build(document, table, synthetic_rows(n), out)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark DOCX table building')
+    parser.add_argument('--rows', dest='rows', type=int, nargs='+',
+                        default=[1000, 10000, 100000], help='Table sizes to time')
+    parser.add_argument('--template', dest='template', default=TEMPLATE,
+                        help='The appendix template to build on')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'bench.docx')
+        print(f"{'rows':>8} {'per-cell':>10} {'bulk':>10} {'speedup':>8}")
+        for n in options.rows:
+            slow = timed(per_cell, n, options.template, out)
+            fast = timed(bulk, n, options.template, out)
+            print(f"{n:>8} {slow:>9.2f}s {fast:>9.2f}s {slow / fast:>7.1f}x")
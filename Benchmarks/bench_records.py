@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""Memory comparison of the old get_dict() port storage against ServiceRecord.
+
+Description:
+    Builds the ports and services dictionaries for a synthetic scan both ways
+    and reports the memory each one holds, measured with tracemalloc. The old
+    layout kept the full get_dict() dict per port in ports plus a separate
+    details tuple in services; the new one shares a single ServiceRecord.
+
+    Example:
+        python3 -m Benchmarks.bench_records --ports 1000000
+"""
+
+import argparse
+import tracemalloc
+
+from Modules.keyFunctions import parse_banner
+from Modules.records import ServiceRecord
+
+
+PORTS = [('22', 'tcp', 'ssh'), ('80', 'tcp', 'http'), ('443', 'tcp', 'https'),
+         ('445', 'tcp', 'microsoft-ds'), ('3389', 'tcp', 'ms-wbt-server'),
+         ('53', 'udp', 'domain'), ('161', 'udp', 'snmp'), ('8080', 'tcp', 'http'),
+         ('21', 'tcp', 'ftp'), ('25', 'tcp', 'smtp')]
+
+
+def synthetic_ports(total):
+    """Yields (ip, port, protocol, service, banner) for a synthetic scan.
+
+    Every value is built fresh, like it would be when read from the XML.
+    """
+    for i in range(total):
+        host = i // len(PORTS)
+        port, protocol, service = PORTS[i % len(PORTS)]
+        ip = f"10.{host // 65536 % 256}.{host // 256 % 256}.{host % 256}"
+        banner = f"product: nginx version: 1.{host % 25}.{i % 3} extrainfo: Ubuntu"
+        yield ip, "".join(port), "".join(protocol), "".join(service), banner
+
+
+def build_dicts(total):
+    pd, srvc = {}, {}
+    for ip, port, protocol, service, banner in synthetic_ports(total):
+        # The old code re-split every banner, so bypass the banner cache here
+        product, version = parse_banner.__wrapped__(banner)[:2]
+        svcDetails = {'id': f"{protocol}.{port}", 'port': port,
+                      'protocol': protocol, 'banner': banner,
+                      'service': service, 'state': 'open', 'reason': 'syn-ack'}
+        pd.setdefault(ip, []).append(svcDetails)
+        srvc.setdefault(service, {'details': []})['details'].append(
+            (ip, port, protocol, product, version))
+    return pd, srvc
+
+
+def build_records(total):
+    pd, srvc = {}, {}
+    for ip, port, protocol, service, banner in synthetic_ports(total):
+        record = ServiceRecord(ip, port, protocol, service, banner)
+        pd.setdefault(ip, []).append(record)
+        srvc.setdefault(record.service, {'details': []})['details'].append(record)
+    return pd, srvc
+
+
+def measure(build, total):
+    tracemalloc.start()
+    result = build(total)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare port storage memory')
+    parser.add_argument('--ports', dest='ports', type=int, default=1000000,
+                        help='Number of open ports in the synthetic scan')
+    options = parser.parse_args()
+
+    old = measure(build_dicts, options.ports)
+    new = measure(build_records, options.ports)
+    print(f"{options.ports} open ports")
+    print(f"get_dict() + tuples : {old / 2**20:10.1f} MiB  {old / options.ports:6.0f} B/port")
+    print(f"ServiceRecord       : {new / 2**20:10.1f} MiB  {new / options.ports:6.0f} B/port")
+    print(f"Saved {100 * (old - new) / old:.0f}%")
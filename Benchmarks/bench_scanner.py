@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""Throughput benchmark of the asyncio port scanner.
+
+Description:
+    Starts listeners on a block of ports on a loopback address, then scans a
+    larger port range there (so most probes hit closed ports, like a real
+    scan) at several concurrency levels and reports ports scanned per second.
+    Every run must find exactly the listening ports, otherwise the script
+    exits non-zero.
+
+    Example:
+        python3 -m Benchmarks.bench_scanner --concurrency 10 100 500 1000
+"""
+
+import argparse
+import socket
+import sys
+import threading
+import time
+
+from Modules.portScanner import PortScanner
+
+
+def listen(address, ports):
+    """Opens a listener on each port and accepts connections in the background.
+
+    Returns:
+        The ports that could be bound.
+    """
+    bound = []
+    for port in ports:
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            server.bind((address, port))
+        except OSError:
+            server.close()
+            continue
+        server.listen(1024)
+        threading.Thread(target=accept, args=(server,), daemon=True).start()
+        bound.append(port)
+    return bound
+
+
+def accept(server):
+    while True:
+        connection, _ = server.accept()
+        connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the port scanner')
+    parser.add_argument('--address', dest='address', default='127.0.0.1',
+                        help='Loopback address to listen and scan on')
+    parser.add_argument('--base', dest='base', type=int, default=40000,
+                        help='First port of the scanned range')
+    parser.add_argument('--ports', dest='ports', type=int, default=5000,
+                        help='Number of ports scanned')
+    parser.add_argument('--open', dest='open', type=int, default=100,
+                        help='Number of those ports with a listener')
+    parser.add_argument('--concurrency', dest='concurrency', type=int, nargs='+',
+                        default=[10, 100, 500, 1000], help='Concurrency levels to time')
+    parser.add_argument('--rate', dest='rate', type=float, default=0,
+                        help='Per host connection rate limit to apply')
+    options = parser.parse_args()
+
+    step = max(options.ports // max(options.open, 1), 1)
+    listening = listen(options.address, range(options.base, options.base + options.ports, step))
+    port_range = f"{options.base}-{options.base + options.ports - 1}"
+    print(f"Scanning {options.ports} ports on {options.address}, {len(listening)} listening")
+
+    failed = False
+    for concurrency in options.concurrency:
+        scanner = PortScanner(concurrency=concurrency, timeout=2.0, rate=options.rate)
+        start = time.perf_counter()
+        hosts = scanner.run(options.address, port_range)
+        elapsed = time.perf_counter() - start
+        found = sorted(service.port for host in hosts for service in host.services)
+        status = "" if found == listening else f"  (found {len(found)}, expected {len(listening)})"
+        failed = failed or bool(status)
+        print(f"concurrency {concurrency:>5}: {elapsed:7.2f}s  "
+              f"{options.ports / elapsed:10.0f} ports/s{status}")
+    if failed:
+        sys.exit(1)
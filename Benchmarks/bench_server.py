@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""Load test of the --serve query server.
+
+Description:
+    Writes a synthetic scan with Benchmarks.generators, starts nmapParse.py
+    --serve on it in a temporary directory and sends a mix of queries (hosts
+    by port, services by name, port counts and hostnames for an IP) over a
+    number of concurrent connections for a fixed time. Reports queries per
+    second and latency percentiles per connection count, and exits non-zero
+    if any query failed.
+
+    Example:
+        python3 -m Benchmarks.bench_server --hosts 100000 --connections 1 8 32
+        python3 -m Benchmarks.bench_server --tcp 127.0.0.1:8642
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from Benchmarks.generators import PORTS, host_ip, write_nmap_xml
+
+
+NMAP_PARSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nmapParse.py')
+
+
+def make_queries(hosts, count, seed):
+    """A shuffled mix of the read-only query types."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        kind = rng.randrange(4)
+        if kind == 0:
+            port, protocol, _ = rng.choice(PORTS)
+            queries.append({'op': 'hosts', 'port': f"{port}/{protocol}"})
+        elif kind == 1:
+            queries.append({'op': 'services', 'name': rng.choice(PORTS)[2], 'limit': 100})
+        elif kind == 2:
+            queries.append({'op': 'port_count'})
+        else:
+            queries.append({'op': 'hostnames', 'ip': host_ip(rng.randrange(hosts))})
+    return [(json.dumps(query) + '\n').encode() for query in queries]
+
+
+async def connect(address):
+    if '/' in address:
+        return await asyncio.open_unix_connection(address, limit=2**26)
+    host, _, port = address.rpartition(':')
+    return await asyncio.open_connection(host, int(port), limit=2**26)
+
+
+async def client(address, queries, deadline, latencies, errors):
+    """Sends queries back to back on one connection until the deadline."""
+    reader, writer = await connect(address)
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        writer.write(queries[i % len(queries)])
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        # Unknown hosts are expected, hostnames are drawn from all generated IPs
+        if not response['ok'] and not response['error'].startswith('unknown host'):
+            errors.append(response['error'])
+        i += 1
+    writer.close()
+
+
+async def load(address, connections, queries, seconds):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(client(address, queries[i::connections] or queries, deadline,
+                                  latencies, errors) for i in range(connections)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def wait_for(address, server, timeout):
+    """Waits until the server accepts connections."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"[-] The server exited with {server.returncode}")
+        try:
+            _, writer = await connect(address)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    sys.exit("[-] The server didn't start in time")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the nmapParse.py query server')
+    parser.add_argument('--hosts', dest='hosts', type=int, default=10000,
+                        help='Hosts in the synthetic scan')
+    parser.add_argument('--connections', dest='connections', type=int, nargs='+',
+                        default=[1, 4, 16], help='Concurrent connections to test')
+    parser.add_argument('--seconds', dest='seconds', type=float, default=5,
+                        help='How long each connection count is tested')
+    parser.add_argument('--tcp', dest='tcp', metavar='HOST:PORT',
+                        help='Serve on this loopback address instead of a unix socket')
+    parser.add_argument('--seed', dest='seed', type=int, default=1,
+                        help='Seed for the scan and the queries')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml = os.path.join(tmp, 'scan.xml')
+        write_nmap_xml(xml, options.hosts, seed=options.seed)
+        address = options.tcp or os.path.join(tmp, 'query.sock')
+        server = subprocess.Popen([sys.executable, NMAP_PARSE, '--serve', address, '--no-cache',
+                                   '-f', xml], cwd=tmp, stdout=subprocess.DEVNULL)
+        try:
+            asyncio.run(wait_for(address, server, 60 + options.hosts / 1000))
+            queries = make_queries(options.hosts, 10000, options.seed)
+            print(f"{options.hosts} hosts, serving on {address}")
+            failed = False
+            for connections in options.connections:
+                latencies, errors, elapsed = asyncio.run(
+                    load(address, connections, queries, options.seconds))
+                latencies.sort()
+                print(f"{connections:>4} connection(s): {len(latencies) / elapsed:9.0f} queries/s  "
+                      f"p50 {percentile(latencies, 0.5) * 1000:7.2f}ms  "
+                      f"p99 {percentile(latencies, 0.99) * 1000:7.2f}ms  "
+                      f"{len(errors)} error(s)")
+                failed = failed or bool(errors)
+        finally:
+            server.terminate()
+            server.wait()
+    if failed:
+        sys.exit(1)
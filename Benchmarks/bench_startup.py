@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""Startup time benchmark for nmapParse.py.
+
+Description:
+    Runs nmapParse.py on a tiny XML file with a few --only selections and
+    reports the average wall time per run, plus the slowest top level
+    imports reported by python -X importtime. Small inputs make startup and
+    unneeded phases the dominant cost, so this is what to watch when adding
+    imports.
+
+    Example:
+        python3 -m Benchmarks.bench_startup --runs 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nmapParse.py')
+SELECTIONS = ['csv', 'csv,hosts', 'hosts,ips,hostnames,csv,services',
+              'appendix,hosts,ips,hostnames,csv,services']
+
+TINY_SCAN = """<?xml version="1.0"?>
+<nmaprun scanner="nmap" args="nmap -sV 10.0.0.1" start="1" version="7.94" xmloutputversion="1.05">
+<host><status state="up" reason="syn-ack"/><address addr="10.0.0.1" addrtype="ipv4"/>
+<hostnames><hostname name="www.example.com" type="PTR"/></hostnames>
+<ports><port protocol="tcp" portid="443"><state state="open" reason="syn-ack"/>
+<service name="https" product="nginx" version="1.18.0" method="probed" conf="10"/></port></ports>
+</host>
+<runstats><finished time="2"/><hosts up="1" down="0" total="1"/></runstats>
+</nmaprun>
+"""
+
+
+def run(args, cwd, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [SCRIPT] + args
+    return subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+
+
+def top_imports(stderr, count):
+    """Parses -X importtime output into the slowest top level imports."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Top level imports are the ones indented by a single space
+        if cumulative.strip().isdigit() and name.startswith(' ') and not name.startswith('  '):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark nmapParse.py startup')
+    parser.add_argument('--runs', dest='runs', type=int, default=10,
+                        help='Runs averaged per selection')
+    parser.add_argument('--top', dest='top', type=int, default=10,
+                        help='Number of slowest imports to list')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scan = os.path.join(tmp, 'tiny.xml')
+        with open(scan, 'w') as xml_file:
+            xml_file.write(TINY_SCAN)
+
+        for only in SELECTIONS:
+            args = ['-q', '-s', '--no-cache', '-f', scan, '--only', only]
+            start = time.perf_counter()
+            for _ in range(options.runs):
+                result = run(args, tmp)
+            elapsed = (time.perf_counter() - start) / options.runs
+            status = "" if result.returncode == 0 else f"  (exit {result.returncode})"
+            print(f"--only {only:<45} {elapsed * 1000:8.1f} ms/run{status}")
+
+            print("    slowest imports (cumulative us):")
+            for cumulative, name in top_imports(run(args, tmp, importtime=True).stderr, options.top):
+                print(f"    {cumulative:>10}  {name}")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""End to end benchmark suite for nmapParse.py, phase by phase.
+
+Description:
+    For each scan size, writes a synthetic nmap XML file and Dehashed export
+    with Benchmarks.generators and times every phase of a run separately:
+    parsing the XML, aggregating it with populate_dictionaries, parsing the
+    Dehashed export, writing the text outputs (hosts, ips, hostnames, csv,
+    services) and building the DOCX appendix. Peak memory of each phase is
+    recorded with tracemalloc, which also slows the phase down, so compare
+    timings between runs of this suite rather than against plain runs.
+
+    The results are written as JSON. Pass an earlier results file with
+    --compare to print how much each phase changed.
+
+    Example:
+        python3 -m Benchmarks.bench_suite --hosts 1000 10000 100000 1000000
+        python3 -m Benchmarks.bench_suite --compare old.json -o new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import Namespace
+
+import nmapParse
+from Benchmarks.bench_dedup import SyntheticParse
+from Benchmarks.generators import write_dehashed, write_nmap_xml
+from Modules.hostnameIndex import HostnameIndex
+from Modules.indexes import IndexedList
+from Modules.parseDehashed import ParseDehashed
+from Modules.reducers import Reducers, summary_names
+from Modules.sinks import read_only_model, run_sinks
+
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Template',
+                        'appendix.docx')
+TEXT_OUTPUTS = ['hosts', 'ips', 'hostnames', 'csv', 'services']
+
+
+def measure(phase, results, work, items):
+    """Runs work(), recording its wall time and peak memory under phase.
+
+    Returns:
+        Whatever work() returned.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = work()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[phase] = {'seconds': round(elapsed, 4), 'peak_bytes': peak, 'items': items(value),
+                      'items_per_second': round(items(value) / elapsed, 1) if elapsed else None}
+    print(f"    {phase:<10} {elapsed:9.3f}s  peak {peak / 2**20:9.1f} MiB  "
+          f"{results[phase]['items']:>10} items")
+    return value
+
+
+def quiet_sinks(model, names):
+    """run_sinks with the console output thrown away."""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as sys.stdout:
+        try:
+            run_sinks(model, names)
+        finally:
+            sys.stdout = stdout
+
+
+def run_size(hosts, options, tmp):
+    """Benchmarks one scan size.
+
+    Returns:
+        A dictionary of phase -> metrics.
+    """
+    xml = os.path.join(tmp, f'scan-{hosts}.xml')
+    dehashed = os.path.join(tmp, f'dehashed-{hosts}.json')
+    write_nmap_xml(xml, hosts, tuple(options.ports_per_host), options.banners,
+                   tuple(options.hostnames), options.seed)
+    write_dehashed(dehashed, hosts * options.entries_per_host, options.seed)
+    print(f"{hosts} hosts ({os.path.getsize(xml) / 2**20:.1f} MiB XML, "
+          f"{os.path.getsize(dehashed) / 2**20:.1f} MiB Dehashed)")
+
+    run_options = Namespace(stream=options.stream, follow=False, verbose=False,
+                            dehashed=[dehashed], files=[xml], db=None)
+    results = {}
+    parsed = measure('parse', results,
+                     lambda: list(nmapParse.NParse(xml, run_options).get_hosts()), len)
+
+    ips, ports, reducers = HostnameIndex(), {}, Reducers(options.summaries)
+    measure('aggregate', results,
+            lambda: SyntheticParse(parsed).populate_dictionaries(ips, ports, reducers),
+            lambda _: sum(len(records) for records in ports.values()))
+    port_count, services = reducers['port_count'].state, reducers['services'].state
+    del parsed
+
+    breached_creds = {}
+    measure('dehashed', results,
+            lambda: ParseDehashed(dehashed, run_options).parse_dehashed_json(
+                breached_creds, IndexedList(), IndexedList()),
+            lambda _: hosts * options.entries_per_host)
+
+    model = read_only_model(ips, ports, port_count, services, breached_creds,
+                            run_options, options.template)
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    try:
+        measure('text', results, lambda: quiet_sinks(model, TEXT_OUTPUTS),
+                lambda _: len(ports))
+        if os.path.exists(options.template):
+            measure('docx', results, lambda: quiet_sinks(model, ['appendix']),
+                    lambda _: sum(len(records) for records in ports.values()))
+        else:
+            print(f"    docx       skipped, no template at {options.template}")
+    finally:
+        os.chdir(cwd)
+
+    os.remove(xml)
+    os.remove(dehashed)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(TEMPLATE)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(old, new):
+    """Prints the change of every phase between two results files."""
+    print("\nChange against the --compare results (time, peak memory):")
+    for size, phases in new['results'].items():
+        for phase, metrics in phases.items():
+            before = old['results'].get(size, {}).get(phase)
+            if not before or not before['seconds'] or not before['peak_bytes']:
+                continue
+            print(f"{size:>8} {phase:<10} "
+                  f"{metrics['seconds'] / before['seconds']:6.2f}x "
+                  f"{metrics['peak_bytes'] / before['peak_bytes']:6.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every phase of nmapParse.py')
+    parser.add_argument('--hosts', dest='hosts', type=int, nargs='+',
+                        default=[1000, 10000, 100000], help='Scan sizes to benchmark')
+    parser.add_argument('--ports-per-host', dest='ports_per_host', type=int, nargs=2,
+                        default=[1, 6], metavar=('MIN', 'MAX'), help='Ports per host')
+    parser.add_argument('--banners', dest='banners', type=int, default=50,
+                        help='Number of distinct service banners')
+    parser.add_argument('--hostnames', dest='hostnames', type=int, nargs=2, default=[0, 3],
+                        metavar=('MIN', 'MAX'), help='Hostnames per host')
+    parser.add_argument('--entries-per-host', dest='entries_per_host', type=int, default=1,
+                        help='Dehashed entries generated per host')
+    parser.add_argument('--seed', dest='seed', type=int, default=1,
+                        help='Seed for the generators')
+    parser.add_argument('--summaries', dest='summaries', nargs='*', default=[],
+                        choices=summary_names(),
+                        help='Extra reducers to run in the aggregate phase')
+    parser.add_argument('-s', '--stream', dest='stream', action='store_true',
+                        help='Parse with the streaming parser instead of libnmap')
+    parser.add_argument('--template', dest='template', default=TEMPLATE,
+                        help='The appendix template for the docx phase')
+    parser.add_argument('-o', '--output', dest='output', default='benchmark-results.json',
+                        help='Where to write the JSON results')
+    parser.add_argument('--compare', dest='compare',
+                        help='An earlier results file to compare against')
+    options = parser.parse_args()
+
+    # DisplayAll reads these from nmapParse's globals
+    nmapParse.quiet = True
+    nmapParse.show_port_details = False
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for hosts in options.hosts:
+            results[str(hosts)] = run_size(hosts, options, tmp)
+
+    report = {'revision': git_revision(), 'python': platform.python_version(),
+              'platform': platform.platform(),
+              'settings': {key: value for key, value in vars(options).items()
+                           if key not in ('output', 'compare')},
+              'results': results}
+    with open(options.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[!] Results written to {options.output}")
+
+    if options.compare:
+        with open(options.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Deterministic generators for synthetic benchmark inputs.
+
+Description:
+    write_nmap_xml writes an nmap -oX style file and write_dehashed a Dehashed
+    JSON export. Both write one host or entry at a time, so inputs with a
+    million hosts don't have to fit in memory, and the same arguments and
+    seed always produce the same file.
+"""
+
+import json
+import random
+
+
+DATABASES = ["LinkedIn", "Adobe", "Canva", "Dropbox", "MyFitnessPal"]
+
+# (port, protocol, service name)
+PORTS = [(21, 'tcp', 'ftp'), (22, 'tcp', 'ssh'), (23, 'tcp', 'telnet'),
+         (25, 'tcp', 'smtp'), (53, 'udp', 'domain'), (80, 'tcp', 'http'),
+         (110, 'tcp', 'pop3'), (123, 'udp', 'ntp'), (135, 'tcp', 'msrpc'),
+         (139, 'tcp', 'netbios-ssn'), (143, 'tcp', 'imap'), (161, 'udp', 'snmp'),
+         (389, 'tcp', 'ldap'), (443, 'tcp', 'https'), (445, 'tcp', 'microsoft-ds'),
+         (1433, 'tcp', 'ms-sql-s'), (3306, 'tcp', 'mysql'), (3389, 'tcp', 'ms-wbt-server'),
+         (5432, 'tcp', 'postgresql'), (5900, 'tcp', 'vnc'), (8080, 'tcp', 'http-proxy'),
+         (8443, 'tcp', 'https-alt')]
+PRODUCTS = ["nginx", "Apache httpd", "OpenSSH", "Microsoft IIS httpd", "Postfix smtpd",
+            "ISC BIND", "Microsoft Windows RPC", "MySQL", "PostgreSQL DB", "vsftpd"]
+OSTYPES = ["Linux", "Windows", "FreeBSD"]
+
+
+def host_ip(i):
+    return f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+
+
+def write_nmap_xml(path, hosts, ports_per_host=(1, 6), banners=50, hostnames=(0, 3),
+                   seed=1):
+    """Writes a synthetic nmap XML file.
+
+    Args:
+        path: Where to write the file.
+        hosts: Number of hosts.
+        ports_per_host: (min, max) number of ports per host. Roughly one in
+            five ports is filtered or closed, the rest are open.
+        banners: Number of distinct product/version banners to draw from.
+        hostnames: (min, max) number of PTR hostnames per host.
+        seed: Seed for the random choices.
+
+    Returns:
+        Nothing
+    """
+    rng = random.Random(seed)
+    max_ports = min(ports_per_host[1], len(PORTS))
+    banner_pool = [(PRODUCTS[i % len(PRODUCTS)], f"{i // len(PRODUCTS)}.{i % 10}",
+                    OSTYPES[i % len(OSTYPES)]) for i in range(max(banners, 1))]
+    with open(path, 'w') as out:
+        out.write('<?xml version="1.0"?>\n<nmaprun scanner="nmap" args="nmap -sV" start="1" '
+                  'version="7.94" xmloutputversion="1.05">\n')
+        for i in range(hosts):
+            ip = host_ip(i)
+            names = "".join(f'<hostname name="host{i}-{j}.example.com" type="PTR"/>'
+                            for j in range(rng.randint(*hostnames)))
+            lines = [f'<host starttime="1" endtime="2"><status state="up" reason="syn-ack"/>'
+                     f'<address addr="{ip}" addrtype="ipv4"/><hostnames>{names}</hostnames><ports>']
+            count = rng.randint(min(ports_per_host[0], max_ports), max_ports)
+            for port, protocol, name in rng.sample(PORTS, count):
+                state = rng.choice(['open', 'open', 'open', 'open', 'filtered', 'closed'])
+                if rng.random() < 0.2:
+                    service = f'<service name="{name}" method="table" conf="3"/>'
+                else:
+                    product, version, ostype = rng.choice(banner_pool)
+                    service = (f'<service name="{name}" product="{product}" version="{version}" '
+                               f'ostype="{ostype}" method="probed" conf="10"/>')
+                lines.append(f'<port protocol="{protocol}" portid="{port}">'
+                             f'<state state="{state}" reason="syn-ack"/>{service}</port>')
+            lines.append('</ports></host>\n')
+            out.write("".join(lines))
+        out.write(f'<runstats><finished time="2"/><hosts up="{hosts}" down="0" '
+                  f'total="{hosts}"/></runstats>\n</nmaprun>\n')
+
+
+def write_dehashed(path, entries, seed=1):
+    """Writes a synthetic Dehashed export, one entry at a time."""
+    rng = random.Random(seed)
+    users = max(entries // 3, 1)
+    with open(path, 'w') as out:
+        out.write('{"balance": 100, "entries": [')
+        for i in range(entries):
+            user = f"user{rng.randrange(users)}"
+            entry = {"id": str(i), "email": f"{user}@example.com", "ip_address": "",
+                     "username": rng.choice(["", user]),
+                     "password": rng.choice(["", f"Summer{rng.randrange(100)}!"]),
+                     "hashed_password": rng.choice(["", f"{rng.getrandbits(64):016x}"]),
+                     "name": "", "vin": "", "address": "", "phone": "",
+                     "database_name": rng.choice(DATABASES)}
+            out.write((", " if i else "") + json.dumps(entry))
+        out.write(f'], "success": true, "took": "1ms", "total": {entries}}}')
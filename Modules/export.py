@@ -1,9 +1,19 @@
 import os
 
+from Modules.profiler import active_profiler
+
+# Buffer size for output files written as they are generated
+WRITE_BUFFER = 1024 * 1024
+
 def exportCsv(dict):
     if not os.path.exists("./output/"):
         os.mkdir("./output/")
-    with open('./output/listening-services.csv', 'w') as csvfile:
-        csvfile.write(f"Port, Listening Services\n")
-        for key in dict.keys():
-            csvfile.write(f"{key} - {dict[key]['protocol']}, {dict[key]['count']}\n")
\ No newline at end of file
+    profiler = active_profiler()
+    with profiler.phase('output:csv:write') as counts:
+        rows = 0
+        with open('./output/listening-services.csv', 'w', buffering=WRITE_BUFFER) as csvfile:
+            csvfile.write("Port, Listening Services\n")
+            for key in dict.keys():
+                csvfile.write(f"{key} - {dict[key]['protocol']}, {dict[key]['count']}\n")
+                rows += 1
+        counts['rows'] = rows
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import heapq
+import os
+import pickle
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+
+from Modules.ipIndex import ip_key
+from Modules.reducers import PortCount
+
+
+# Rough in-memory size of one buffered record, used to turn the --max-memory
+# budget into a number of records
+ITEM_SIZE_ESTIMATE = 512
+# Items pickled together in a run file. Merging holds one batch per run.
+RUN_BATCH = 1024
+
+
+class ExternalSorter(object):
+    """Sorts more items than fit in memory.
+
+    Items are buffered until max_items is reached, then sorted and spilled
+    to a run file. Iterating does a k-way merge of the run files and the
+    buffer, so only one batch per run is in memory at a time. Call finish()
+    once all items are added; after that it can be iterated any number of
+    times, also from several threads at once.
+    """
+
+    def __init__(self, key, max_items, directory):
+        self.key = key
+        self.max_items = max(max_items, 1)
+        self.directory = directory
+        self.buffer = []
+        self.runs = []
+
+    def add(self, item):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.max_items:
+            self.spill()
+
+    def spill(self):
+        """Writes the buffer out as a sorted run file."""
+        self.buffer.sort(key=self.key)
+        fd, path = tempfile.mkstemp(suffix='.run', dir=self.directory)
+        with os.fdopen(fd, 'wb') as run:
+            for i in range(0, len(self.buffer), RUN_BATCH):
+                pickle.dump(self.buffer[i:i + RUN_BATCH], run, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.buffer = []
+
+    def finish(self):
+        self.buffer.sort(key=self.key)
+
+    @staticmethod
+    def read_run(path):
+        with open(path, 'rb') as run:
+            while True:
+                try:
+                    batch = pickle.load(run)
+                except EOFError:
+                    return
+                yield from batch
+
+    def __iter__(self):
+        return heapq.merge(*[self.read_run(path) for path in self.runs],
+                           self.buffer, key=self.key)
+
+
+class SpilledScan(object):
+    """Parse results kept in sorted run files instead of dictionaries, for --max-memory.
+
+    Hosts and open ports are added in parse order and come back in IP order
+    through a k-way merge, deduplicated the same way populate_dictionaries
+    does it. Only the PortCount reducer, which is bounded by the number of
+    distinct ports, stays in memory.
+    """
+
+    def __init__(self, max_memory_MB, verbose=False, directory=None):
+        self.tmp = tempfile.TemporaryDirectory(prefix='nmapParse-', dir=directory)
+        # The hosts and records sorters each get half of the budget
+        self.max_items = max(max_memory_MB * 2**20 // ITEM_SIZE_ESTIMATE // 2, 1)
+        self.verbose = verbose
+        self.hosts = ExternalSorter(itemgetter(0, 1, 2), self.max_items, self.tmp.name)
+        self.records = ExternalSorter(itemgetter(0, 1, 2), self.max_items, self.tmp.name)
+        self.port_count = PortCount()
+        self.seq = 0
+
+    def add_host(self, ip, hostnames, records):
+        """Adds one host block, its hostnames and its open port ServiceRecords."""
+        key = ip_key(ip)
+        self.hosts.add((key, ip, self.seq, tuple(hostnames)))
+        self.seq += 1
+        for record in records:
+            # Duplicates are only dropped in the merge; the count includes them anyway
+            self.port_count.update(ip, record, True)
+            self.records.add((key, ip, self.seq, record))
+            self.seq += 1
+
+    def finish(self):
+        self.hosts.finish()
+        self.records.finish()
+
+    def close(self):
+        self.tmp.cleanup()
+
+    def ips(self):
+        """Yields (ip, unique hostnames) in IP order, like the ips HostnameIndex."""
+        for (_, ip), group in groupby(self.hosts, key=itemgetter(0, 1)):
+            names = []
+            for *_, hostnames in group:
+                for name in hostnames:
+                    if name and name not in names:
+                        names.append(name)
+            yield ip, names
+
+    def ports(self):
+        """Yields (ip, list of ServiceRecords) in IP order, like the ports dictionary."""
+        for (_, ip), group in groupby(self.records, key=itemgetter(0, 1)):
+            records, seen = [], set()
+            for *_, record in group:
+                if self.verbose or record.key not in seen:
+                    seen.add(record.key)
+                    records.append(record)
+            yield ip, records
+
+    def host_entries(self):
+        """Yields (ip, hostnames, records) for every IP with open ports, in IP order."""
+        hosts = self.ips()
+        current = next(hosts, None)
+        for ip, records in self.ports():
+            key = (ip_key(ip), ip)
+            while current is not None and (ip_key(current[0]), current[0]) < key:
+                current = next(hosts, None)
+            hostnames = current[1] if current is not None and current[0] == ip else []
+            yield ip, hostnames, records
+
+    def services(self):
+        """Yields (service, records) grouped by service name, each in IP order.
+
+        The records of a service are a lazy iterator, so a service with
+        millions of hosts is never held in memory at once. This sorts the
+        records a second time, by service, in its own run files.
+        """
+        sorter = ExternalSorter(itemgetter(0, 1, 2), self.max_items, self.tmp.name)
+        seq = 0
+        for ip, records in self.ports():
+            key, seen = ip_key(ip), set()
+            for record in records:
+                if record.details not in seen:
+                    seen.add(record.details)
+                    sorter.add((record.service, key, seq, record))
+                    seq += 1
+        sorter.finish()
+        try:
+            for service, group in groupby(sorter, key=itemgetter(0)):
+                yield service, (record for *_, record in group)
+        finally:
+            for path in sorter.runs:
+                os.remove(path)
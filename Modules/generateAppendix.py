@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
 
+import io
 import os
+import re
+import time
+import zipfile
+from collections import deque
+from itertools import islice, repeat
 
+from docx import Document
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.text import WD_COLOR_INDEX
-from docx.shared import Inches, RGBColor, Pt
-from Modules.keyFunctions import join_values, split_banner
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import RGBColor, Pt
+from lxml import etree
+from Modules.ipIndex import IPIndex
+from Modules.profiler import active_profiler
+from Modules.sinks import worker_pool
+from Modules.tableWriter import cell_prefixes, paragraph_xml, rows_xml
 
 
 WHITE = "FFFFFF"
@@ -16,10 +29,178 @@ TEXT_STYLE = "Text"
 TESTER_NAME = "TrustFoundry"
 HEADING_LEVEL = 2
 
+# Table rows (or Dehashed users) rendered per job. With --jobs the chunks of
+# every section are rendered in parallel worker processes.
+CHUNK_ROWS = 5000
+DOCUMENT_XML = 'word/document.xml'
+# Where a section's rendered chunks go in the saved document.xml
+PLACEHOLDER = re.compile(r'<!--appendix:(\w+)-->')
 
-def export_db(db, name, attr, doc):
-    for d in db[name][attr]:
-        doc.add_paragraph(d, style=SUB_BULLET_STYLE)
+
+def add_header(table, titles):
+    cells = table.rows[0].cells
+    for cell, title in zip(cells, titles):
+        run = cell.paragraphs[0].add_run(title)
+        run.font.color.rgb = RGBColor.from_string(WHITE)
+
+    for cell in cells:
+        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        cell.paragraphs[0].paragraph_format.space_before = Pt(2)
+        cell.paragraphs[0].paragraph_format.space_after = Pt(2)
+
+
+def hostnames_section(document, heading):
+    """Adds Appendix I up to its table header and returns the table."""
+    document.add_page_break()
+    document.add_heading(
+        'Appendix I - Enumerated Hostnames', level=HEADING_LEVEL)
+    hostname_summary = "The following table illustrates the mappings of all IP addresses and hostnames enumerated during this engagement."
+    document.add_paragraph(hostname_summary, style=TEXT_STYLE)
+    table = document.add_table(rows=1, cols=2)
+    table.style = TABLE_STYLE
+    add_header(table, ["IP", "Hostnames"])
+    return table
+
+
+def services_section(document, heading):
+    """Adds Appendix II up to its table header and returns the table."""
+    document.add_page_break()
+    document.add_heading(
+        'Appendix II - Listening Services', level=HEADING_LEVEL)
+    summary0 = "The following table illustrates all the services TrustFoundry enumerated during this engagement."
+    document.add_paragraph(summary0, style=TEXT_STYLE)
+    table = document.add_table(rows=1, cols=6)
+    table.style = TABLE_STYLE
+    add_header(table, ["IP", "Port", "Protocol", "Service Type", "Identified Services",
+                       "Identified Version"])
+    return table
+
+
+def dehashed_section(document, heading):
+    """Adds the Dehashed appendix up to its list of users."""
+    document.add_page_break()
+    document.add_heading(
+        f"Appendix {heading} - Users with Leaked Credentials in Data Breaches", level=HEADING_LEVEL)
+    summary1 = f"{TESTER_NAME} searched through various data breaches to identify any "
+    summary2 = "CLIENTNAME"
+    summary3 = " employees who have had credentials exposed in a breach. The following is a list of users who were identified as having had credentials exposed in one or more data breaches; note that only instances in which a user's hashed or plaintext password was identified as being exposed are included."
+    para = document.add_paragraph(summary1, style=TEXT_STYLE)
+    para.add_run(summary2).font.highlight_color = WD_COLOR_INDEX.YELLOW
+    para.add_run(summary3)
+
+
+SECTIONS = {'hostnames': hostnames_section,
+            'services': services_section,
+            'dehashed': dehashed_section}
+
+
+def build_section(template, name, heading):
+    """Builds one section in its own copy of the template.
+
+    This runs in a worker process with --jobs, so it must stay a top level
+    function. Since every section starts from the same template, the style
+    and numbering ids it references are the ones of the final document.
+
+    Args:
+        template: The template document, saved to bytes.
+        name: The SECTIONS entry to build.
+        heading: The appendix number of the section.
+
+    Returns:
+        A (XML of the section's body elements, cell prefixes of its table)
+        tuple. The table prefixes are None for a section without a table.
+        A placeholder comment marks where the section's rows go.
+    """
+    document = Document(io.BytesIO(template))
+    body = document.element.body
+    tail = 1 if body.sectPr is not None else 0
+    start = len(body) - tail
+    table = SECTIONS[name](document, heading)
+
+    placeholder = etree.Comment(f'appendix:{name}')
+    if table is not None:
+        table._tbl.append(placeholder)
+    elif body.sectPr is not None:
+        body.sectPr.addprevious(placeholder)
+    else:
+        body.append(placeholder)
+    elements = body[start:len(body) - tail]
+    xml = ''.join(etree.tostring(element, encoding='unicode') for element in elements)
+    return xml, cell_prefixes(table) if table is not None else None
+
+
+def users_xml(entries, bullet_id, sub_bullet_id):
+    """Renders a chunk of Dehashed users and their breached databases."""
+    return ''.join(paragraph_xml(name, bullet_id, space_after=0) +
+                   ''.join(paragraph_xml(database, sub_bullet_id) for database in databases)
+                   for name, databases in entries)
+
+
+def chunked(items, size=CHUNK_ROWS):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bounded_map(executor, fn, *iterables, window):
+    """Like executor.map, but with at most window calls submitted and not yet consumed.
+
+    Executor.map submits every call up front, so the results of all chunks
+    would pile up in memory while splice() is still writing the first ones.
+    """
+    pending = deque()
+    for args in zip(*iterables):
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
+def timed(items, spent):
+    """Yields the items, adding the seconds spent waiting for each to spent[0]."""
+    items = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        finally:
+            spent[0] += time.perf_counter() - start
+        yield item
+
+
+def splice(document, chunks, path):
+    """Saves the document with each placeholder replaced by its section's rendered chunks.
+
+    The chunks are written into the zip as they come in, so they are never
+    parsed back into a tree or joined into one string.
+
+    Args:
+        document: The python-docx Document holding the placeholders.
+        chunks: Section name -> iterable of rendered XML strings.
+        path: Where to write the .docx.
+    """
+    saved = io.BytesIO()
+    document.save(saved)
+    with zipfile.ZipFile(saved) as source, zipfile.ZipFile(path, 'w') as target:
+        for item in source.infolist():
+            if item.filename != DOCUMENT_XML:
+                target.writestr(item, source.read(item.filename))
+                continue
+            pieces = PLACEHOLDER.split(source.read(item.filename).decode('utf-8'))
+            with target.open(item, 'w') as out:
+                # split() alternates between the XML around the placeholders and their names
+                for i, piece in enumerate(pieces):
+                    if i % 2 == 0:
+                        out.write(piece.encode('utf-8'))
+                    else:
+                        for xml in chunks[piece]:
+                            out.write(xml.encode('utf-8'))
 
 
 class AppendixGenerator:
@@ -28,128 +209,83 @@ class AppendixGenerator:
         self.options = options
         self.MAX_LIMIT = 30
 
-    def export_doc(self, dehashed_dict, ips, ports, document):
+    def export_doc(self, dehashed_dict, ips, ports, document, index=None):
+        """Writes ./appendix/appendix.docx.
+
+        Each section is built from the template on its own and its rows are
+        rendered in chunks of CHUNK_ROWS, all in a pool of --jobs worker
+        processes when jobs > 1. The sections are then added to document in
+        order and the rendered rows written straight into the saved file.
+        Chunks are submitted as the file is written, a few per worker ahead.
+        """
 
         if not os.path.exists('./appendix/'):
             os.mkdir('./appendix/')
 
-        if not self.options.files:
+        has_scan = self.options.files or self.options.db or getattr(self.options, 'scan', None)
+        if has_scan and index is None:
+            index = IPIndex(ips)
+
+        if not has_scan:
             DEHASHED_HEADING = "I"
         else:
             DEHASHED_HEADING = "III"
 
+        # The rows of every section, in document order
+        sections = {}
+        if has_scan:
+            sections['hostnames'] = ((ip, [host for host in ips[ip] if host != ''])
+                                     for ip in index.select(ips))
+            sections['services'] = ((ipaddr, record.port, record.protocol, record.service,
+                                     record.product, record.version)
+                                    for ipaddr in index.select(ports)
+                                    for record in ports[ipaddr])
+        if self.options.dehashed:
+            sections['dehashed'] = ((name, list(dehashed_dict[name]['database']))
+                                    for name in dehashed_dict.keys())
+
+        profiler = active_profiler()
+        with profiler.phase('output:appendix:template'):
+            template = io.BytesIO()
+            document.save(template)
+        jobs = getattr(self.options, 'jobs', 1) or 1
+        executor = None
+        run = map
+        if jobs > 1:
+            executor = worker_pool(jobs)
 
-        if self.options.files:
-            # Add the hostname mapping table
-            document.add_page_break()
-            document.add_heading(
-                'Appendix I - Enumerated Hostnames', level=HEADING_LEVEL)
-            hostname_summary = "The following table illustrates the mappings of all IP addresses and hostnames enumerated during this engagement."
-            document.add_paragraph(hostname_summary, style=TEXT_STYLE)
-            table = document.add_table(rows=1, cols=2)
-            table.style = TABLE_STYLE
-            cells = table.rows[0].cells
-
-            run = cells[0].paragraphs[0].add_run("IP")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            run = cells[1].paragraphs[0].add_run("Hostnames")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            for cell in cells:
-                cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                cell.paragraphs[0].paragraph_format.space_before = Pt(2)
-                cell.paragraphs[0].paragraph_format.space_after = Pt(2)
-
-            for ip in sorted(ips.keys(), key=lambda ip: [int(ip) for ip in ip.split('.')]):
-                row = table.add_row().cells
-                run = row[0].paragraphs[0].add_run(ip)
-                run.font.bold = False
-                for host in ips[ip]:
-                    lasthost = ips[ip][-1]
-                    if host is not lasthost and host != '':
-                        run = row[1].paragraphs[0].add_run(host)
-                    elif host != '':
-                        run = row[1].paragraphs[0].add_run(host)
-
-                    for r in row:
-                        r.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        r.paragraphs[0].paragraph_format.space_before = Pt(2)
-                        r.paragraphs[0].paragraph_format.space_after = Pt(2)
-
-            # Add the table of listening services
-            document.add_page_break()
-            document.add_heading(
-                'Appendix II - Listening Services', level=HEADING_LEVEL)
-            summary0 = "The following table illustrates all the services TrustFoundry enumerated during this engagement."
-            document.add_paragraph(summary0, style=TEXT_STYLE)
-            table = document.add_table(rows=1, cols=6)
-            table.style = TABLE_STYLE
-            cells = table.rows[0].cells
-
-            run = cells[0].paragraphs[0].add_run("IP")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            run = cells[1].paragraphs[0].add_run("Port")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            run = cells[2].paragraphs[0].add_run("Protocol")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            run = cells[3].paragraphs[0].add_run("Service Type")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            run = cells[4].paragraphs[0].add_run("Identified Services")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            run = cells[5].paragraphs[0].add_run("Identified Version")
-            run.font.color.rgb = RGBColor.from_string(WHITE)
-
-            for cell in cells:
-                cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                cell.paragraphs[0].paragraph_format.space_before = Pt(2)
-                cell.paragraphs[0].paragraph_format.space_after = Pt(2)
-
-            for ipaddr in sorted(ports.keys(), key=lambda ip: [int(ip) for ip in ip.split('.')]):
-                for i in range(len(ports[ipaddr])):
-                    row = table.add_row().cells
-                    try:
-                        dict = ports[ipaddr][i]
-                    except KeyError:
-                        continue
-                    port, protocol, service = dict[
-                        'port'], dict['protocol'], dict['service']
-                    banner = dict['banner']
-                    product, version = split_banner(banner)
-                    run = row[0].paragraphs[0].add_run(ipaddr)
-                    run.font.bold = False
-                    run = row[1].paragraphs[0].add_run(port)
-                    run = row[2].paragraphs[0].add_run(protocol)
-                    run = row[3].paragraphs[0].add_run(service)
-                    run = row[4].paragraphs[0].add_run(product)
-                    run = row[5].paragraphs[0].add_run(version)
-                    for r in row:
-                        r.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        r.paragraphs[0].paragraph_format.space_before = Pt(
-                            2)
-                        r.paragraphs[0].paragraph_format.space_after = Pt(
-                            2)
+            def run(fn, *iterables):
+                # Enough chunks in flight to keep every worker busy
+                return bounded_map(executor, fn, *iterables, window=2 * jobs)
 
-        if self.options.dehashed:
+        try:
+            with profiler.phase('output:appendix:sections') as counts:
+                built = run(build_section, repeat(template.getvalue()), sections,
+                            repeat(DEHASHED_HEADING))
+                body = document.element.body
+                chunks = {}
+                for name, (xml, prefixes) in zip(sections, built):
+                    for element in list(parse_xml(f'<w:body {nsdecls("w")}>{xml}</w:body>')):
+                        if body.sectPr is not None:
+                            body.sectPr.addprevious(element)
+                        else:
+                            body.append(element)
+                    if prefixes is not None:
+                        chunks[name] = run(rows_xml, repeat(prefixes), chunked(sections[name]))
+                    else:
+                        chunks[name] = run(users_xml, chunked(sections[name]),
+                                           repeat(document.styles[BULLET_STYLE].style_id),
+                                           repeat(document.styles[SUB_BULLET_STYLE].style_id))
+                counts['sections'] = len(chunks)
 
-            """Add the table of breached credentials"""
-            document.add_page_break()
-            document.add_heading(
-                f"Appendix {DEHASHED_HEADING} - Users with Leaked Credentials in Data Breaches", level=HEADING_LEVEL)
-            summary1 = f"{TESTER_NAME} searched through various data breaches to identify any "
-            summary2 = "CLIENTNAME"
-            summary3 = " employees who have had credentials exposed in a breach. The following is a list of users who were identified as having had credentials exposed in one or more data breaches; note that only instances in which a user's hashed or plaintext password was identified as being exposed are included."
-            para = document.add_paragraph(summary1, style=TEXT_STYLE)
-            para.add_run(summary2).font.highlight_color = WD_COLOR_INDEX.YELLOW
-            para.add_run(summary3)
-            for name in dehashed_dict.keys():
-                email = document.add_paragraph(name, style=BULLET_STYLE)
-                email.paragraph_format.space_after = Inches(0)
-                export_db(dehashed_dict, name, 'database', document)
-
-        document.save('./appendix/appendix.docx')
+            # The rows are rendered while the document is saved, so the time
+            # spent waiting for them is split off from the save
+            spent = [0]
+            chunks = {name: timed(section, spent) for name, section in chunks.items()}
+            start = time.perf_counter()
+            splice(document, chunks, './appendix/appendix.docx')
+            profiler.add('output:appendix:rows', spent[0])
+            profiler.add('output:appendix:save', time.perf_counter() - start - spent[0])
+        finally:
+            if executor is not None:
+                executor.shutdown()
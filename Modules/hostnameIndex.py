@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import sys
+
+
+class HostnameIndex(dict):
+    """The ips dictionary: IP -> its unique hostnames, plus the reverse lookup.
+
+    Each IP maps to a list of its hostnames in the order they were first
+    seen. Names are interned, so a hostname repeated across many scan files
+    is stored once, and empty names and repeats are never added, so the
+    lists don't grow with the number of overlapping files. A host rarely has
+    more than a handful of names, so the membership check scans the short
+    list instead of keeping a set per IP.
+
+    by_hostname maps every hostname back to the IPs it was seen on. If
+    changed is set to a dictionary, every IP that gets a new hostname is
+    added to it as a key, e.g. for --follow to rewrite just those hosts.
+    """
+
+    changed = None
+
+    def __init__(self):
+        super().__init__()
+        self.by_hostname = {}
+
+    def add(self, ip, hostnames=()):
+        """Records a host and all of its hostnames.
+
+        Args:
+            ip: The host's IP address.
+            hostnames: Every hostname reported for it in this host block.
+
+        Returns:
+            Nothing
+        """
+        names = self.get(ip)
+        if names is None:
+            names = self[ip] = []
+        for hostname in hostnames:
+            if hostname and hostname not in names:
+                hostname = sys.intern(hostname)
+                names.append(hostname)
+                if self.changed is not None:
+                    self.changed[ip] = None
+                # The (ip, hostname) pair is new, so ip isn't listed yet either
+                self.by_hostname.setdefault(hostname, []).append(ip)
+
+    def merge(self, other):
+        """Adds every host of another HostnameIndex, e.g. a --jobs partial."""
+        for ip, hostnames in other.items():
+            self.add(ip, hostnames)
+
+    def ips_for(self, hostname):
+        """The IPs a hostname was seen on, in the order they were found."""
+        return self.by_hostname.get(hostname, [])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+
+class IndexedList(list):
+    """A list that keeps a set of item keys for constant time dedup checks.
+
+    Items stay in insertion order, so it can be used anywhere a plain list
+    was used before.
+    """
+
+    def __init__(self, items=()):
+        super().__init__()
+        self.index = set()
+        for item in items:
+            self.add(item)
+
+    def add(self, item, key=None):
+        """Appends an item unless one with the same key was already added.
+
+        Args:
+            item: The item to append.
+            key: The hashable dedup key. Defaults to the item itself.
+
+        Returns:
+            True if the item was appended, False if it was a duplicate.
+        """
+        if key is None:
+            key = item
+        if key in self.index:
+            return False
+        self.index.add(key)
+        self.append(item)
+        return True
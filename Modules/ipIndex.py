@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import ipaddress
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+
+
+# IPv6 keys are offset past every IPv4 key so both fit in one sorted array,
+# and anything that isn't an address sorts last
+IPV6_OFFSET = 1 << 128
+INVALID = 1 << 129
+
+
+def ip_key(ip):
+    """Packs an address into an integer that sorts IPv4 numerically, then IPv6."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return INVALID
+    return int(address) + (IPV6_OFFSET if address.version == 6 else 0)
+
+
+class IPIndex(object):
+    """The IP addresses of a scan, converted once and kept sorted.
+
+    Every output iterates the index instead of sorting the dictionaries
+    itself, so hosts.txt, the IP list and the appendix all share one order.
+    Sorted packed keys also make CIDR lookups two bisects.
+    """
+
+    def __init__(self, ips):
+        pairs = sorted((ip_key(ip), ip) for ip in ips)
+        self.keys = [key for key, _ in pairs]
+        self.ips = [ip for _, ip in pairs]
+
+    def __iter__(self):
+        return iter(self.ips)
+
+    def __len__(self):
+        return len(self.ips)
+
+    def select(self, mapping):
+        """The indexed IPs that are keys of mapping, in sorted order."""
+        keys = set(mapping.keys())
+        return [ip for ip in self.ips if ip in keys]
+
+    def in_network(self, network):
+        """The indexed IPs inside a CIDR range, e.g. 10.0.1.0/24.
+
+        Raises:
+            ValueError: If network isn't a valid IPv4 or IPv6 network.
+        """
+        network = ipaddress.ip_network(network, strict=False)
+        start = bisect_left(self.keys, ip_key(str(network.network_address)))
+        end = bisect_right(self.keys, ip_key(str(network.broadcast_address)))
+        return self.ips[start:end]
+
+    def subnets(self, prefix=24, ipv6_prefix=64):
+        """Groups the indexed IPs by subnet, in sorted order.
+
+        Args:
+            prefix: The IPv4 prefix length to group by.
+            ipv6_prefix: The IPv6 prefix length to group by.
+
+        Returns:
+            A generator of (subnet, list of IPs). Entries that aren't IP
+            addresses are grouped under 'other'.
+        """
+        def subnet(pair):
+            key, _ = pair
+            if key >= INVALID:
+                return 0, 0
+            if key >= IPV6_OFFSET:
+                shift = 128 - ipv6_prefix
+                return 6, (key - IPV6_OFFSET) >> shift << shift
+            shift = 32 - prefix
+            return 4, key >> shift << shift
+
+        for (version, base), pairs in groupby(zip(self.keys, self.ips), key=subnet):
+            if version == 4:
+                network = ipaddress.IPv4Network((base, prefix))
+            elif version == 6:
+                network = ipaddress.IPv6Network((base, ipv6_prefix))
+            else:
+                network = 'other'
+            yield str(network), [ip for _, ip in pairs]
@@ -1,35 +1,55 @@
+from collections import namedtuple
+from functools import lru_cache
+
+
+# Distinct banners kept in the parse cache. Large scans repeat the same few
+# thousand banners, so this comfortably covers them while bounding memory.
+BANNER_CACHE_SIZE = 65536
+
+Banner = namedtuple('Banner', ['product', 'version', 'extrainfo', 'ostype', 'fields'])
+
+
 def join_values(l):
     return " ".join(l)
 
 
-def split_banner(b):
-    headings = {'test': 'test'}
-    banner = b.split()
-    heading_word = ""
-    value = ""
-    for i in range(len(banner)):
+@lru_cache(maxsize=BANNER_CACHE_SIZE)
+def parse_banner(b):
+    """Parses a libnmap banner string in a single pass.
 
-        word = banner[i]
-        last_word = banner[-1]
-        if word.endswith(':') and word is not last_word:
+    Each distinct banner is only parsed once; identical banners share the
+    same Banner result.
+
+    Args:
+        b: The banner string, e.g. "product: nginx version: 1.18.0"
+
+    Returns:
+        A Banner with the product, version, extrainfo and ostype values
+        ('Unknown' when missing) and every (heading, value) pair in order.
+    """
+    headings = {}
+    banner = b.split()
+    heading_word = None
+    value_index = None
+    last_index = len(banner) - 1
+    for i, word in enumerate(banner):
+        if word.endswith(':') and i != last_index:
             heading_word = word.strip(':')
-            value = banner[i + 1]
-            headings[heading_word] = [value]
-        elif word is not value:
-            try:
-                headings[heading_word].append(word)
-            except KeyError:
-                continue
-
-    try:
-        product = headings['product']
-        full_product = join_values(product)
-    except KeyError:
-        full_product = 'Unknown'
-
-    try:
-        version = headings['version']
-        full_version = join_values(version)
-    except KeyError:
-        full_version = 'Unknown'
-    return full_product, full_version
\ No newline at end of file
+            value_index = i + 1
+            headings[heading_word] = [banner[value_index]]
+        elif i != value_index and heading_word is not None:
+            headings[heading_word].append(word)
+
+    fields = tuple((heading, join_values(values))
+                   for heading, values in headings.items())
+    values = dict(fields)
+    return Banner(values.get('product', 'Unknown'),
+                  values.get('version', 'Unknown'),
+                  values.get('extrainfo', 'Unknown'),
+                  values.get('ostype', 'Unknown'),
+                  fields)
+
+
+def split_banner(b):
+    parsed = parse_banner(b)
+    return parsed.product, parsed.version
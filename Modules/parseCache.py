@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+
+# Bump whenever the shape of the cached partial results changes, so entries
+# written by an older version are never loaded.
+CACHE_VERSION = 3
+CACHE_SUFFIX = ".pickle"
+
+
+class ParseCache(object):
+    """On-disk cache of per-file parse results.
+
+    Entries are keyed on the file's absolute path, size and modification
+    time (plus the options that change the result), so editing or replacing
+    a file makes its old entry unreachable. Stale entries are removed by
+    evict() once the cache grows past its size cap, oldest use first.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+
+    def key(self, file, options):
+        stat = os.stat(file)
+        verbose = getattr(options, 'verbose', False)
+        summaries = ','.join(sorted(getattr(options, 'summaries', None) or ()))
+        raw = (f"{CACHE_VERSION}|{os.path.abspath(file)}|{stat.st_size}|{stat.st_mtime_ns}|"
+               f"{verbose}|{summaries}")
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def path(self, file, options):
+        return os.path.join(self.cache_dir, self.key(file, options) + CACHE_SUFFIX)
+
+    def get(self, file, options):
+        """Loads the cached parse result for a file.
+
+        Returns:
+            The cached (ips, ports, reducers) tuple, or None if
+            the file isn't cached or the entry can't be read.
+        """
+        path = self.path(file, options)
+        try:
+            with open(path, 'rb') as cached:
+                partial = pickle.load(cached)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        # Mark the entry as recently used for eviction
+        os.utime(path)
+        return partial
+
+    def put(self, file, options, partial):
+        """Stores the parse result for a file.
+
+        The entry is written to a temporary file first and then moved into
+        place, so parallel workers never see a half written entry.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as cached:
+                pickle.dump(partial, cached, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(file, options))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits its size cap."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
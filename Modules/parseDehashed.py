@@ -1,7 +1,94 @@
 #!/usr/bin/env python3
 
 import json
-import sys
+
+from Modules.indexes import IndexedList
+
+
+# Bytes read from the JSON file at a time while streaming
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+class EntryStream(object):
+    """Streams the objects of the top level "entries" array of a Dehashed export.
+
+    Only one chunk of the file and one entry are held in memory at a time,
+    so exports with millions of entries don't need to fit in RAM.
+    """
+
+    def __init__(self, json_file):
+        self.json_file = json_file
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Reads the next chunk, dropping what has already been consumed."""
+        chunk = self.json_file.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def expect(self, chars):
+        """Consumes the next non-whitespace character, which must be one of chars."""
+        self.skip_whitespace()
+        if self.pos >= len(self.buffer) or self.buffer[self.pos] not in chars:
+            raise json.decoder.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+    def value(self):
+        """Decodes the next JSON value, reading more of the file as needed."""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.decoder.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number cut off at the end of the chunk still decodes, so only
+            # trust a value that ends before the buffer does
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        self.expect('{')
+        self.skip_whitespace()
+        if self.buffer[self.pos:self.pos + 1] == '}':
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key == 'entries':
+                self.expect('[')
+                self.skip_whitespace()
+                if self.buffer[self.pos:self.pos + 1] == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield self.value()
+                        if self.expect(',]') == ']':
+                            break
+            else:
+                self.value()
+            if self.expect(',}') == '}':
+                return
 
 
 class ParseDehashed(object):
@@ -10,36 +97,79 @@ class ParseDehashed(object):
         self.options = options
 
     def parse_dehashed_json(self, dict, password_spray, credential_stuffing):
+        """Parses a Dehashed JSON export one entry at a time.
+
+        Args:
+            dict: The dictionary of breached credentials, keyed on email.
+            password_spray: An IndexedList of usernames for password spraying.
+            credential_stuffing: An IndexedList of (username, password) pairs.
+
+        Returns:
+            Doesn't return anything, but all arguments will be populated.
+
+        Raises:
+            ValueError: If the file isn't a Dehashed JSON export.
+        """
         with open(self.file, "r") as json_file:
             try:
-                data = json.load(json_file)
-            except json.decoder.JSONDecodeError:
-                print("Something went wrong. Check your json file and try again.")
-                sys.exit()
-
-            entries = data['entries']
-            for user in entries:
-                email = user['email'].split(';')[0].strip()
-                password = user['password']
-                password_hash = user['hashed_password']
-                database_name = user['database_name']
-                username = user['username']
-                creds = {'password': {password}, 'username': {username},
-                         'hash': {password_hash}, 'database': {database_name}}
-
-                usr = email.split('@')[0].strip()
-                if usr not in password_spray:
-                    password_spray.append(usr)
-
-                if password != '' or password_hash != '':
-                    if email not in dict.keys():
-                        dict[email] = creds
-                    else:
-                        dict[email]['username'].add(username)
-                        dict[email]['password'].add(password)
-                        dict[email]['hash'].add(password_hash)
-                        dict[email]['database'].add(database_name)
-                    if password != '':
-                        stuff = usr, password
-                        if stuff not in credential_stuffing:
-                            credential_stuffing.append(stuff)
\ No newline at end of file
+                for user in EntryStream(json_file):
+                    self.add_entry(user, dict, password_spray, credential_stuffing)
+            except (json.decoder.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"{self.file} isn't a valid Dehashed export: {e!r}") from e
+
+    def add_entry(self, user, dict, password_spray, credential_stuffing):
+        email = user['email'].split(';')[0].strip()
+        password = user['password']
+        password_hash = user['hashed_password']
+        database_name = user['database_name']
+        username = user['username']
+        creds = {'password': {password}, 'username': {username},
+                 'hash': {password_hash}, 'database': {database_name}}
+
+        usr = email.split('@')[0].strip()
+        password_spray.add(usr)
+
+        if password != '' or password_hash != '':
+            if email not in dict.keys():
+                dict[email] = creds
+            else:
+                dict[email]['username'].add(username)
+                dict[email]['password'].add(password)
+                dict[email]['hash'].add(password_hash)
+                dict[email]['database'].add(database_name)
+            if password != '':
+                stuff = usr, password
+                credential_stuffing.add(stuff)
+
+
+def parse_dehashed_file(file, options):
+    """Parses a single Dehashed file into its own partial result.
+
+    This is the worker used by --jobs, so it must stay a top level function.
+
+    Returns:
+        A partial (breached_creds, password_spray, credential_stuffing) tuple.
+    """
+    breached_creds, password_spray, credential_stuffing = {}, IndexedList(), IndexedList()
+    ParseDehashed(file, options).parse_dehashed_json(
+        breached_creds, password_spray, credential_stuffing)
+    return breached_creds, password_spray, credential_stuffing
+
+
+def merge_dehashed(partial, dict, password_spray, credential_stuffing):
+    """Merges a partial result from parse_dehashed_file, in file order.
+
+    Returns:
+        Doesn't return anything, but all arguments will be updated.
+    """
+    p_dict, p_spray, p_stuffing = partial
+    for email, creds in p_dict.items():
+        if email not in dict.keys():
+            dict[email] = creds
+        else:
+            for field, values in creds.items():
+                dict[email][field].update(values)
+    for usr in p_spray:
+        password_spray.add(usr)
+    for stuff in p_stuffing:
+        credential_stuffing.add(stuff)
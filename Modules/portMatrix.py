@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import ipaddress
+
+import numpy as np
+
+
+class PortMatrix(object):
+    """A hosts x (port, protocol) boolean matrix of open ports.
+
+    Built in bulk from the ports dictionary once parsing is done, so port
+    counts and cross-host questions become vectorized reductions instead of
+    nested loops over every host. Rows follow the order of the ports
+    dictionary and columns the order in which each (port, protocol) was
+    first seen.
+    """
+
+    def __init__(self, ips, columns, matrix):
+        self.ips = ips
+        self.columns = columns
+        self.column_index = {column: i for i, column in enumerate(columns)}
+        self.matrix = matrix
+
+    @classmethod
+    def from_ports(cls, ports):
+        """Builds the matrix from the ports dictionary.
+
+        Args:
+            ports: The dictionary of IP -> list of ServiceRecords.
+
+        Returns:
+            A PortMatrix.
+        """
+        ips = []
+        columns = {}
+        rows, cols = [], []
+        for row, (ip, records) in enumerate(ports.items()):
+            ips.append(ip)
+            for record in records:
+                rows.append(row)
+                cols.append(columns.setdefault(record.key, len(columns)))
+
+        matrix = np.zeros((len(ips), len(columns)), dtype=bool)
+        matrix[np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)] = True
+        return cls(np.array(ips, dtype=object), list(columns), matrix)
+
+    def host_counts(self):
+        """Number of hosts with each (port, protocol) open, one entry per column."""
+        return self.matrix.sum(axis=0)
+
+    def port_count(self):
+        """The counts in the same shape as the port_count dictionary.
+
+        Like port_count, TCP and UDP on the same port number share an entry,
+        labelled with the protocol that was seen first. Unlike the dictionary
+        built while parsing, a host seen in several files is counted once.
+        """
+        pc = {}
+        for (port, protocol), count in zip(self.columns, self.host_counts().tolist()):
+            if port not in pc:
+                pc[port] = {'protocol': protocol, 'count': count}
+            else:
+                pc[port]['count'] += count
+        return pc
+
+    def cooccurrence(self):
+        """Columns x columns matrix of how many hosts have both ports open.
+
+        The product is taken in the smallest unsigned type that holds the
+        number of hosts, which bounds every count.
+        """
+        counts = self.matrix.astype(np.min_scalar_type(len(self.ips)))
+        return counts.T @ counts
+
+    def hosts_with(self, keys):
+        """IPs that have every one of the given (port, protocol) keys open."""
+        if any(key not in self.column_index for key in keys):
+            return []
+        cols = [self.column_index[key] for key in keys]
+        return self.ips[self.matrix[:, cols].all(axis=1)].tolist()
+
+    def profiles(self):
+        """Groups hosts that have exactly the same set of open ports.
+
+        Returns:
+            A list of (list of (port, protocol) keys, list of IPs), largest
+            group first.
+        """
+        if not len(self.ips):
+            return []
+        packed = np.packbits(self.matrix, axis=1)
+        unique, inverse, counts = np.unique(packed, axis=0, return_inverse=True,
+                                            return_counts=True)
+        # Sorting the hosts by group once splits them all in a single pass;
+        # the stable sort keeps them in dictionary order within a group
+        order = np.argsort(inverse.reshape(-1), kind='stable')
+        members = np.split(self.ips[order], np.cumsum(counts)[:-1])
+        groups = []
+        for group in np.argsort(-counts, kind='stable'):
+            profile = np.unpackbits(unique[group])[:len(self.columns)].astype(bool)
+            keys = [self.columns[i] for i in np.flatnonzero(profile)]
+            groups.append((keys, members[group].tolist()))
+        return groups
+
+    def subnet_counts(self, prefix=24):
+        """Open port counts per subnet.
+
+        IPv4 addresses are grouped by the given prefix length and IPv6
+        addresses by /64.
+
+        Returns:
+            A list of subnet names and a subnets x columns count matrix.
+        """
+        labels = [str(ipaddress.ip_network(
+            f"{ip}/{prefix if ipaddress.ip_address(ip).version == 4 else 64}",
+            strict=False)) for ip in self.ips]
+        subnets, inverse = np.unique(np.array(labels, dtype=object), return_inverse=True)
+        counts = np.zeros((len(subnets), len(self.columns)), dtype=np.int64)
+        np.add.at(counts, inverse.reshape(-1), self.matrix)
+        return subnets.tolist(), counts
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import asyncio
+import errno
+import ipaddress
+import socket
+
+
+DEFAULT_PORTS = "21,22,23,25,53,80,110,135,139,143,389,443,445,1433,3306,3389,5432,5900,8080,8443"
+# Bytes and seconds spent waiting for a service to greet us when grabbing banners
+BANNER_SIZE = 1024
+BANNER_TIMEOUT = 2.0
+# Addresses one --scan may cover, a /12; larger ranges are a job for nmap
+MAX_TARGETS = 1 << 20
+
+
+class ScanService(object):
+    """A scanned port, with the same attributes NParse reads from a libnmap service"""
+
+    def __init__(self, port, state, banner=''):
+        self.port = port
+        self.protocol = 'tcp'
+        self.state = state
+        self.banner = banner
+        try:
+            self.service = socket.getservbyport(port, 'tcp')
+        except OSError:
+            self.service = 'unknown'
+
+
+class ScanHost(object):
+    """A scanned host, with the same attributes NParse reads from a libnmap host"""
+
+    def __init__(self, address, services):
+        self.address = address
+        self.hostnames = []
+        self.services = services
+
+
+def parse_ports(spec):
+    """Expands a port list like "22,80,8000-8100" into sorted port numbers.
+
+    Raises:
+        ValueError: If a port or range isn't valid.
+    """
+    ports = set()
+    for part in spec.split(','):
+        first, _, last = part.strip().partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if not 0 < first <= last <= 65535:
+            raise ValueError(f"invalid port or range: {part}")
+        ports.update(range(first, last + 1))
+    return sorted(ports)
+
+
+class Targets(object):
+    """The addresses of some IPs and CIDR ranges, generated on demand.
+
+    Only the networks are kept, so a large range takes no memory until it is
+    scanned, and every iteration generates its addresses again.
+    """
+
+    def __init__(self, networks):
+        self.networks = networks
+        # Not __len__, an IPv6 range can be too large for it
+        self.size = sum(network.num_addresses for network in networks)
+
+    def __iter__(self):
+        return (str(ip) for network in self.networks for ip in network)
+
+
+def parse_targets(spec):
+    """Parses comma separated IPs and CIDR ranges without expanding them.
+
+    Returns:
+        The Targets, iterating the addresses in the order given.
+
+    Raises:
+        ValueError: If a target isn't an IP address or network, or they add
+            up to more than MAX_TARGETS addresses.
+    """
+    targets = Targets([ipaddress.ip_network(part.strip(), strict=False)
+                       for part in spec.split(',')])
+    if targets.size > MAX_TARGETS:
+        raise ValueError(f"{spec} is {targets.size} addresses, more than the "
+                         f"{MAX_TARGETS} a scan may cover; use nmap for larger ranges")
+    return targets
+
+
+def banner_text(data):
+    """Turns a service greeting into a banner string parse_banner can read."""
+    line = data.decode('utf-8', 'replace').splitlines()[0] if data.strip() else ''
+    # parse_banner treats words ending in ':' as headings
+    words = [word.rstrip(':') for word in line.split() if word.isprintable()]
+    return f"extrainfo: {' '.join(words)}" if words else ''
+
+
+class PortScanner(object):
+    """An asyncio TCP connect scanner.
+
+    A fixed pool of workers pulls (ip, port) pairs from a shared iterator, so
+    memory stays flat no matter how many targets there are, and the number of
+    workers is the number of connections in flight. Pairs are handed out
+    port by port across all hosts, which spreads the load over the hosts the
+    way nmap does; rate additionally caps the connections per second to any
+    one host.
+    """
+
+    def __init__(self, concurrency=500, timeout=1.0, rate=0, banners=False):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate = rate
+        self.banners = banners
+        self.next_slot = {}
+
+    async def throttle(self, ip):
+        """Waits for this host's next connection slot when a rate is set."""
+        if not self.rate:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot.get(ip, now))
+        self.next_slot[ip] = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def probe(self, ip, port):
+        """Connects to one port.
+
+        Returns:
+            A (state, banner) tuple. state is 'open', 'closed' when the host
+            refused the connection, or 'filtered' when it didn't answer.
+
+        Raises:
+            OSError: If we ran out of file descriptors, which would otherwise
+                make every port look filtered.
+        """
+        await self.throttle(ip)
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, port), self.timeout)
+        except ConnectionRefusedError:
+            return 'closed', ''
+        except asyncio.TimeoutError:
+            return 'filtered', ''
+        except OSError as e:
+            if e.errno in (errno.EMFILE, errno.ENFILE):
+                raise OSError(e.errno, f"{e.strerror}; use a --scan-concurrency below "
+                                       "the open file limit (ulimit -n)") from e
+            return 'filtered', ''
+
+        banner = ''
+        try:
+            if self.banners:
+                try:
+                    banner = banner_text(await asyncio.wait_for(
+                        reader.read(BANNER_SIZE), BANNER_TIMEOUT))
+                except (OSError, asyncio.TimeoutError):
+                    pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        return 'open', banner
+
+    async def scan(self, targets, ports):
+        """Scans every port on every target.
+
+        targets is iterated once per port and once more for the results, so
+        it has to be re-iterable, e.g. Targets.
+
+        Returns:
+            A list of ScanHosts in target order, one per host that answered,
+            each with its open ports in port order.
+        """
+        pairs = ((ip, port) for port in ports for ip in targets)
+        results = {}
+
+        async def worker():
+            for ip, port in pairs:
+                state, banner = await self.probe(ip, port)
+                if state != 'filtered':
+                    services = results.setdefault(ip, [])
+                    if state == 'open':
+                        services.append(ScanService(port, state, banner))
+
+        await asyncio.gather(*(worker() for _ in range(max(self.concurrency, 1))))
+        return [ScanHost(ip, sorted(results[ip], key=lambda service: service.port))
+                for ip in targets if ip in results]
+
+    def run(self, targets, ports):
+        """Runs scan() to completion; targets and ports are the CLI spec strings."""
+        return asyncio.run(self.scan(parse_targets(targets), parse_ports(ports)))
+
+
+def scan_hosts(targets, options):
+    """Scans the targets with the --scan-* options, for NParse.get_hosts()."""
+    scanner = PortScanner(options.scan_concurrency, options.scan_timeout,
+                          options.scan_rate, options.scan_banners)
+    return scanner.run(targets, options.scan_ports)
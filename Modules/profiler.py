@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Profiler(object):
+    """Collects per-phase metrics for --profile.
+
+    Each phase records its wall and CPU time and the peak memory traced while
+    it ran. Whatever the caller stores in the dictionary yielded by phase()
+    is kept as the phase's item counts, along with the matching throughput.
+    With a dump directory, every top level phase is also run under cProfile
+    and its stats are written to <dump_dir>/<phase>.prof.
+
+    Phases nest, e.g. parse:xml inside parse, and a nested phase's peak
+    memory counts towards the enclosing one. Work spread over many short
+    calls, like deduplicating each record, is summed up with steps() and
+    recorded with add() instead.
+    """
+
+    enabled = True
+
+    def __init__(self, dump_dir=None):
+        self.dump_dir = dump_dir
+        self.phases = {}
+        self.info = {}
+        # Peaks of the enclosing phases that trace memory, innermost last
+        self.peaks = []
+        # Per thread nesting depth and whether its phases run alongside others
+        self.local = threading.local()
+        self.start = time.perf_counter()
+        self.start_cpu = self.cpu_time()
+        tracemalloc.start()
+
+    @staticmethod
+    def cpu_time():
+        """CPU time of this process and its finished children, e.g. --jobs workers."""
+        times = os.times()
+        return time.process_time() + times.children_user + times.children_system
+
+    @contextmanager
+    def phase(self, name, thread=False):
+        """Measures the code run inside the with block.
+
+        Args:
+            name: The phase name used in the metrics file.
+            thread: Measure only the current thread's CPU time, for phases
+                that run alongside each other. Phases nested in it do the
+                same. Their peak memory is only recorded with a dump
+                directory, which makes them run one at a time.
+
+        Yields:
+            A dictionary for the phase's item counts.
+        """
+        local = self.local
+        depth = getattr(local, 'depth', 0)
+        outer_thread = getattr(local, 'thread', False)
+        thread = thread or outer_thread
+        trace = not thread or bool(self.dump_dir)
+        counts = {}
+        profile = None
+        # cProfile can't nest, the enclosing phase's stats cover this one
+        if self.dump_dir and depth == 0:
+            import cProfile
+            profile = cProfile.Profile()
+        cpu_time = time.thread_time if thread else self.cpu_time
+        if trace:
+            before = tracemalloc.get_traced_memory()[1]
+            self.peaks.append(0)
+            tracemalloc.reset_peak()
+        local.depth, local.thread = depth + 1, thread
+        start, start_cpu = time.perf_counter(), cpu_time()
+        if profile:
+            profile.enable()
+        try:
+            yield counts
+        finally:
+            if profile:
+                profile.disable()
+            local.depth, local.thread = depth, outer_thread
+            wall = time.perf_counter() - start
+            metrics = {'wall_seconds': round(wall, 4),
+                       'cpu_seconds': round(cpu_time() - start_cpu, 4)}
+            if trace:
+                peak = max(tracemalloc.get_traced_memory()[1], self.peaks.pop())
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], before, peak)
+                metrics['peak_memory_bytes'] = peak
+            metrics['counts'] = counts
+            metrics['per_second'] = {key: round(value / wall, 1) if wall else None
+                                     for key, value in counts.items()}
+            self.phases[name] = metrics
+            if profile:
+                os.makedirs(self.dump_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.dump_dir, name.replace(':', '-') + '.prof'))
+
+    def add(self, name, seconds, **counts):
+        """Adds time and item counts summed up by the caller to a phase.
+
+        For work interleaved with other work in a loop, where a with block
+        per item would cost more than the work itself.
+        """
+        metrics = self.phases.setdefault(name, {'wall_seconds': 0, 'counts': {}})
+        metrics['wall_seconds'] = round(metrics['wall_seconds'] + seconds, 4)
+        for key, value in counts.items():
+            metrics['counts'][key] = metrics['counts'].get(key, 0) + value
+        wall = metrics['wall_seconds']
+        metrics['per_second'] = {key: round(value / wall, 1) if wall else None
+                                 for key, value in metrics['counts'].items()}
+
+    def steps(self):
+        """A Steps timer for the interleaved steps of a loop."""
+        return Steps()
+
+    def write(self, path):
+        """Writes the collected metrics as JSON."""
+        report = {'wall_seconds': round(time.perf_counter() - self.start, 4),
+                  'cpu_seconds': round(self.cpu_time() - self.start_cpu, 4),
+                  'peak_memory_bytes': max([tracemalloc.get_traced_memory()[1]] + [
+                      phase.get('peak_memory_bytes', 0) for phase in self.phases.values()]),
+                  'phases': self.phases}
+        report.update(self.info)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+class Steps(object):
+    """Sums up the time of steps interleaved in a loop, for Profiler.add().
+
+    lap(step) adds the time since the previous lap to the step and counts
+    it, so a loop is split into steps by a lap after each of them.
+    """
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.laps = Counter()
+        self.last = time.perf_counter()
+
+    def lap(self, step):
+        now = time.perf_counter()
+        self.seconds[step] += now - self.last
+        self.laps[step] += 1
+        self.last = now
+
+
+class NullSteps(object):
+    """Stands in for Steps when --profile isn't used."""
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.laps = Counter()
+
+    def lap(self, step):
+        pass
+
+
+class NullProfiler(object):
+    """Stands in for Profiler when --profile isn't used."""
+
+    enabled = False
+    dump_dir = None
+
+    def __init__(self):
+        self.info = {}
+
+    @contextmanager
+    def phase(self, name, thread=False):
+        yield {}
+
+    def add(self, name, seconds, **counts):
+        pass
+
+    def steps(self):
+        return NullSteps()
+
+
+_active = NullProfiler()
+
+
+def active_profiler():
+    """The profiler of this run, for phases measured inside the modules.
+
+    --jobs worker processes always get a NullProfiler.
+    """
+    return _active
+
+
+def set_active_profiler(profiler):
+    global _active
+    _active = profiler
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+
+import asyncio
+import ipaddress
+import json
+import os
+import signal
+import stat
+
+from Modules.hostnameIndex import HostnameIndex
+from Modules.indexes import IndexedList
+from Modules.ipIndex import IPIndex
+from Modules.parseDehashed import merge_dehashed, parse_dehashed_file
+from Modules.reducers import Reducers
+from Modules.sinks import read_only_model, run_sinks, worker_pool
+
+
+# Protocols tried for a port query without one
+PROTOCOLS = ('tcp', 'udp', 'sctp')
+# Longest request line accepted, a large ingest file list still fits
+MAX_REQUEST = 1024 * 1024
+
+QUERY_HELP = ('requests are one JSON object per line with an "op" of: '
+              'hosts {"port": "445/tcp"}, services {"name": "http"}, port_count, '
+              'hostnames {"ip": ...}, ips_for {"hostname": ...}, hosts_in {"cidr": ...}, '
+              'stats, ingest {"files": [...], "dehashed": [...]} or render {"only": [...]}')
+
+
+def parse_address(address):
+    """Splits a --serve address into a unix socket path or a loopback host and port.
+
+    Anything containing a / is a unix socket path. Otherwise it is HOST:PORT
+    or just PORT on 127.0.0.1; the host has to be a loopback address, since
+    the server has no authentication.
+
+    Returns:
+        ('unix', path) or ('tcp', host, port).
+
+    Raises:
+        ValueError: If the address isn't a socket path or a loopback address.
+    """
+    if '/' in address:
+        return 'unix', address
+    host, _, port = address.rpartition(':')
+    host = host.strip('[]') or '127.0.0.1'
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"invalid port in {address!r}")
+    if host != 'localhost':
+        try:
+            loopback = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"{host} isn't a loopback address; use 127.0.0.1, ::1 "
+                             "or a unix socket path")
+    return 'tcp', host, int(port)
+
+
+def unseen(paths, ingested):
+    """The paths that aren't ingested yet, each once, in the order given."""
+    seen = {os.path.realpath(path) for path in ingested}
+    new = []
+    for path in paths:
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            new.append(path)
+    return new
+
+
+def record_json(record):
+    return {'ip': record.ip, 'port': record.port, 'protocol': record.protocol,
+            'service': record.service, 'product': record.product, 'version': record.version}
+
+
+class QueryServer(object):
+    """Keeps a parsed scan in memory and answers JSON queries about it.
+
+    Each connection sends one JSON request per line and gets one JSON line
+    back, {"ok": true, ...} or {"ok": false, "error": ...}. Queries are
+    answered from the same dictionaries, reducers and indexes a normal run
+    builds, so they never touch the XML again.
+
+    XML files are parsed in a process pool by the --jobs worker (with the
+    parse cache), so the server keeps answering while they are parsed. Only
+    merging a parsed file blocks queries, and merges wait for any render in
+    progress, so the outputs are always written from a consistent model.
+    """
+
+    def __init__(self, options, template, parse_file, merge_dictionaries, outputs):
+        self.options = options
+        self.template = template
+        self.parse_file = parse_file
+        self.merge_dictionaries = merge_dictionaries
+        self.outputs = outputs
+        # Hosts per port are kept by a reducer, updated while parsing like the others
+        options.summaries = list(options.summaries) + ['port_hosts']
+
+        self.clear()
+        self.files = []
+        self.dehashed_files = []
+        self.order = None
+        self.pool = None
+        self.lock = None
+
+    def clear(self):
+        """Empties the model, before it is built again from the ingested files."""
+        self.ips = HostnameIndex()
+        self.ports = {}
+        self.reducers = Reducers(self.options.summaries)
+        self.breached_creds = {}
+        self.password_spray = IndexedList()
+        self.cred_stuffing = IndexedList()
+        self.index = None
+        self.sorted_hosts = {}
+
+    def get_index(self):
+        """The IPIndex, rebuilt on the first query after an ingest."""
+        if self.index is None:
+            self.index = IPIndex(self.ips)
+            self.order = None
+        return self.index
+
+    def get_order(self):
+        """IP -> its position in the index, to sort IPs without parsing them again."""
+        index = self.get_index()
+        if self.order is None:
+            self.order = {ip: i for i, ip in enumerate(index)}
+        return self.order
+
+    async def ingest(self, files, dehashed):
+        """Parses XML and Dehashed files and adds them to the model.
+
+        Files are parsed side by side and merged in the order given. If any
+        of them can't be parsed nothing is merged. A file that was already
+        ingested replaces its earlier contents: the model is built again
+        from every ingested file, in the order they were first given, so
+        the counts of a re-scan aren't added twice.
+        """
+        for name, paths in (('files', files), ('dehashed', dehashed)):
+            if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+                raise ValueError(f"{name} must be a list of file paths")
+        missing = [file for file in files + dehashed if not os.path.isfile(file)]
+        if missing:
+            raise ValueError(f"no such file(s): {', '.join(missing)}")
+
+        new_files = unseen(files, self.files)
+        new_dehashed = unseen(dehashed, self.dehashed_files)
+        replace = len(new_files) < len(files) or len(new_dehashed) < len(dehashed)
+        if replace:
+            files, dehashed = self.files + new_files, self.dehashed_files + new_dehashed
+        else:
+            files, dehashed = new_files, new_dehashed
+
+        loop = asyncio.get_running_loop()
+        partials = await asyncio.gather(
+            *(loop.run_in_executor(self.pool, self.parse_file, file, self.options)
+              for file in files))
+        dehashed_partials = await asyncio.gather(
+            *(loop.run_in_executor(self.pool, parse_dehashed_file, file, self.options)
+              for file in dehashed))
+
+        async with self.lock:
+            if replace:
+                self.clear()
+                self.files, self.dehashed_files = [], []
+            for partial in partials:
+                self.merge_dictionaries(partial, self.ips, self.ports, self.reducers,
+                                        self.options.verbose)
+            for partial in dehashed_partials:
+                merge_dehashed(partial, self.breached_creds, self.password_spray,
+                               self.cred_stuffing)
+            self.index = None
+            self.sorted_hosts = {}
+            self.files += files
+            self.dehashed_files += dehashed
+        if files and not self.options.no_cache:
+            from Modules.parseCache import ParseCache
+            ParseCache(self.options.cache_dir, self.options.cache_size).evict()
+        return self.stats()
+
+    async def render(self, only=None):
+        """Writes the selected outputs to ./output/ from the current model."""
+        names = [output for output in self.outputs if only is None or output in only]
+        unknown = [output for output in only or () if output not in self.outputs]
+        if unknown:
+            raise ValueError(f"unknown output(s): {', '.join(unknown)}")
+        summaries = self.reducers.summaries()
+        names += ['summaries'] if summaries and only is None else []
+
+        async with self.lock:
+            model = read_only_model(self.ips, self.ports, self.reducers['port_count'].state,
+                                    self.reducers['services'].state, self.breached_creds,
+                                    self.options, self.template, index=self.get_index(),
+                                    summaries=summaries)
+            await asyncio.get_running_loop().run_in_executor(None, run_sinks, model, names)
+        return {'outputs': names, 'directory': os.path.abspath('./output/')}
+
+    def stats(self):
+        return {'hosts': len(self.ips), 'hosts_with_ports': len(self.ports),
+                'open_ports': sum(len(records) for records in self.ports.values()),
+                'services': len(self.reducers['services'].state),
+                'credentials': len(self.breached_creds),
+                'files': self.files, 'dehashed': self.dehashed_files}
+
+    def hosts(self, port):
+        """The IPs with a port open, "445/tcp", or "445" for any protocol."""
+        number, _, protocol = str(port).partition('/')
+        if not number.isdigit():
+            raise ValueError(f"invalid port {port!r}, e.g. 445/tcp")
+        key = number, protocol
+        if key not in self.sorted_hosts:
+            by_port = self.reducers['port_hosts'].state
+            hosts = set()
+            for protocol in (protocol,) if protocol else PROTOCOLS:
+                hosts.update(by_port.get((number, protocol), ()))
+            self.sorted_hosts[key] = sorted(hosts, key=self.get_order().__getitem__)
+        return {'hosts': self.sorted_hosts[key]}
+
+    def services(self, name, limit=None):
+        details = self.reducers['services'].state.get(name, {'details': []})['details']
+        records = details[:limit] if limit is not None else details
+        return {'count': len(details), 'records': [record_json(record) for record in records]}
+
+    def port_count(self, port=None):
+        counts = self.reducers['port_count'].state
+        if port is not None:
+            counts = {port: counts[port]} if port in counts else {}
+        return {'port_count': counts}
+
+    def hostnames(self, ip):
+        if ip not in self.ips:
+            raise ValueError(f"unknown host {ip}")
+        return {'hostnames': self.ips[ip]}
+
+    def ips_for(self, hostname):
+        return {'ips': self.ips.ips_for(hostname)}
+
+    def hosts_in(self, cidr):
+        return {'hosts': self.get_index().in_network(cidr)}
+
+    async def answer(self, request):
+        """Runs one request.
+
+        Returns:
+            The response dictionary, without the ok flag.
+
+        Raises:
+            ValueError: If the request can't be answered.
+        """
+        if not isinstance(request, dict):
+            raise ValueError(QUERY_HELP)
+        op = request.get('op')
+        try:
+            if op == 'hosts':
+                return self.hosts(request['port'])
+            if op == 'services':
+                return self.services(request['name'], request.get('limit'))
+            if op == 'port_count':
+                return self.port_count(request.get('port'))
+            if op == 'hostnames':
+                return self.hostnames(request['ip'])
+            if op == 'ips_for':
+                return self.ips_for(request['hostname'])
+            if op == 'hosts_in':
+                return self.hosts_in(request['cidr'])
+            if op == 'stats':
+                return self.stats()
+            if op == 'ingest':
+                return await self.ingest(request.get('files', []), request.get('dehashed', []))
+            if op == 'render':
+                return await self.render(request.get('only'))
+        except KeyError as e:
+            raise ValueError(f"{op} needs {e}")
+        raise ValueError(QUERY_HELP)
+
+    async def handle(self, reader, writer):
+        """Answers the requests of one connection until it closes."""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    response = {'ok': False, 'error': f"request over {MAX_REQUEST} bytes"}
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    response = {'ok': True}
+                    response.update(await self.answer(json.loads(line)))
+                except ValueError as e:
+                    response = {'ok': False, 'error': str(e)}
+                except Exception as e:
+                    response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address):
+        self.lock = asyncio.Lock()
+        kind, *where = parse_address(address)
+        # ingest submits to the pool while a render may be running the sinks
+        # in threads, so its workers mustn't be forked
+        with worker_pool(max(self.options.jobs, 1)) as self.pool:
+            if self.options.files or self.options.dehashed:
+                print("[+] Loading the scan")
+                stats = await self.ingest(self.options.files or [],
+                                          self.options.dehashed or [])
+                print(f"[+] Loaded {stats['hosts']} host(s), {stats['open_ports']} open port(s)")
+            if kind == 'unix':
+                path, = where
+                if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+                    os.remove(path)
+                # Only the user running the server may query it. The socket
+                # file is created with these permissions, never wider ones.
+                umask = os.umask(0o177)
+                try:
+                    server = await asyncio.start_unix_server(self.handle, path,
+                                                             limit=MAX_REQUEST)
+                finally:
+                    os.umask(umask)
+            else:
+                host, port = where
+                server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST)
+            print(f"[+] Listening on {address}")
+            # Stop cleanly on kill too, so a unix socket file isn't left behind
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, asyncio.current_task().cancel)
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                if kind == 'unix' and os.path.exists(where[0]):
+                    os.remove(where[0])
+
+    def run(self, address):
+        try:
+            asyncio.run(self.serve(address))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("[!] Server stopped")
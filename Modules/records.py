@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import sys
+
+from Modules.keyFunctions import parse_banner
+
+
+class ServiceRecord(object):
+    """A compact record of one open port on one host.
+
+    The same record is shared by the ports and services dictionaries, and the
+    small set of repeated strings (ports, protocols, service names) is
+    interned so every record points at a single copy. The banner is parsed
+    once here and the cached Banner is shared by all records with that banner.
+    """
+
+    __slots__ = ('ip', 'port', 'protocol', 'service', 'banner', 'parsed')
+
+    def __init__(self, ip, port, protocol, service, banner):
+        self.ip = ip
+        self.port = sys.intern(port)
+        self.protocol = sys.intern(protocol)
+        self.service = sys.intern(service)
+        self.banner = banner
+        self.parsed = parse_banner(banner)
+
+    @property
+    def product(self):
+        return self.parsed.product
+
+    @property
+    def version(self):
+        return self.parsed.version
+
+    @property
+    def key(self):
+        """The (port, protocol) key used to dedup ports on a single IP."""
+        return self.port, self.protocol
+
+    @property
+    def details(self):
+        """The key used to dedup the hosts listed under a service."""
+        return self.ip, self.port, self.protocol, self.product, self.version
+
+    def __repr__(self):
+        return (f"ServiceRecord(ip={self.ip!r}, port={self.port!r}, "
+                f"protocol={self.protocol!r}, service={self.service!r}, "
+                f"banner={self.banner!r})")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import ipaddress
+from abc import ABC, abstractmethod
+
+from Modules.indexes import IndexedList
+from Modules.ipIndex import ip_key
+
+
+REDUCERS = {}
+# Always run, the outputs are built from them
+BUILTIN = ['port_count', 'services']
+
+
+def register_reducer(name):
+    """Class decorator that registers an aggregation under the given name."""
+    def register(cls):
+        cls.name = name
+        REDUCERS[name] = cls
+        return cls
+    return register
+
+
+class Reducer(ABC):
+    """An aggregation updated record by record while the hosts are parsed.
+
+    Every reducer sees each open port once, in parse order, in the same pass
+    that fills the ports dictionary, so adding one never means another loop
+    over the parsed data. The state must be mergeable: --jobs and the parse
+    cache build one reducer per file and merge them in file order, which has
+    to give the same state as feeding all files to a single reducer.
+
+    Reducers with a summary output derive from Summary as well.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.state = {}
+
+    @abstractmethod
+    def update(self, ip, record, new):
+        """Adds one open port.
+
+        Args:
+            ip: The host's IP address.
+            record: The port's ServiceRecord.
+            new: False if this port was already listed for the IP, so
+                populate_dictionaries drops it as a duplicate.
+        """
+
+    @abstractmethod
+    def merge(self, other, kept=None):
+        """Adds the state of another reducer of the same kind.
+
+        Args:
+            other: The reducer to merge in, e.g. from a --jobs partial.
+            kept: Optional function telling whether a record of the other
+                reducer survived the port dedup of the merge. Only reducers
+                that use the new flag of update() need it.
+        """
+
+
+class Summary(Reducer):
+    """A reducer written to ./output/ by the summaries sink.
+
+    Subclasses set filename and header and return their rows from rows().
+    """
+
+    filename = None
+    header = None
+
+    @abstractmethod
+    def rows(self):
+        """The CSV rows under header."""
+
+
+@register_reducer('port_count')
+class PortCount(Reducer):
+    """The port_count dictionary: port -> protocol and number of times seen open."""
+
+    def update(self, ip, record, new):
+        counts = self.state.get(record.port)
+        if counts is None:
+            self.state[record.port] = {'protocol': record.protocol, 'count': 1}
+        else:
+            counts['count'] += 1
+
+    def merge(self, other, kept=None):
+        for port, counts in other.state.items():
+            if port not in self.state:
+                self.state[port] = dict(counts)
+            else:
+                self.state[port]['count'] += counts['count']
+
+
+@register_reducer('services')
+class Services(Reducer):
+    """The services dictionary: service -> the unique records running it."""
+
+    def update(self, ip, record, new):
+        # Ports dropped as duplicates of an IP's earlier entry aren't listed
+        if not new:
+            return
+        if record.service not in self.state:
+            self.state[record.service] = {'details': IndexedList()}
+        self.state[record.service]['details'].add(record, record.details)
+
+    def merge(self, other, kept=None):
+        for service, svc in other.state.items():
+            for record in svc['details']:
+                if kept is None or kept(record):
+                    if service not in self.state:
+                        self.state[service] = {'details': IndexedList()}
+                    self.state[service]['details'].add(record, record.details)
+
+
+class HostSets(Reducer):
+    """Counts distinct hosts per key; sets make the merge exact without kept."""
+
+    @abstractmethod
+    def key(self, record):
+        """The key a record's host is counted under."""
+
+    def update(self, ip, record, new):
+        key = self.key(record)
+        hosts = self.state.get(key)
+        if hosts is None:
+            hosts = self.state[key] = set()
+        hosts.add(ip)
+
+    def merge(self, other, kept=None):
+        for key, hosts in other.state.items():
+            self.state.setdefault(key, set()).update(hosts)
+
+    def rows(self):
+        """Keys with their host counts, most hosts first."""
+        counted = sorted(self.state.items(), key=lambda item: (-len(item[1]), item[0]))
+        return [key + (len(hosts),) for key, hosts in counted]
+
+
+@register_reducer('products')
+class Products(HostSets, Summary):
+    """Hosts per product and version, for matching against advisories."""
+
+    filename = 'product-versions.csv'
+    header = ('Product', 'Version', 'Hosts')
+
+    def key(self, record):
+        return record.product, record.version
+
+
+@register_reducer('top-services')
+class TopServices(HostSets, Summary):
+    """Services ranked by the number of hosts running them."""
+
+    filename = 'top-services.csv'
+    header = ('Service', 'Hosts')
+
+    def key(self, record):
+        return record.service,
+
+
+@register_reducer('port_hosts')
+class PortHosts(HostSets):
+    """The IPs with each (port, protocol) open, for the query server's lookups."""
+
+    def key(self, record):
+        return record.key
+
+
+@register_reducer('subnets')
+class Subnets(Summary):
+    """Open ports and hosts per /24 (/64 for IPv6)."""
+
+    filename = 'subnet-open-ports.csv'
+    header = ('Subnet', 'Open Ports', 'Hosts')
+
+    def __init__(self):
+        super().__init__()
+        # A host's ports arrive together, so its subnet is looked up once
+        self.last = None, None
+
+    def subnet(self, ip):
+        if self.last[0] != ip:
+            try:
+                address = ipaddress.ip_address(ip)
+                prefix = 64 if address.version == 6 else 24
+                network = str(ipaddress.ip_network((address, prefix), strict=False))
+            except ValueError:
+                network = 'other'
+            self.last = ip, network
+        return self.last[1]
+
+    def update(self, ip, record, new):
+        subnet = self.subnet(ip)
+        ports = self.state.get(subnet)
+        if ports is None:
+            ports = self.state[subnet] = set()
+        ports.add((ip,) + record.key)
+
+    def merge(self, other, kept=None):
+        for subnet, ports in other.state.items():
+            self.state.setdefault(subnet, set()).update(ports)
+
+    def rows(self):
+        """Subnets in address order."""
+        def order(subnet):
+            return ip_key(subnet.split('/')[0])
+        return [(subnet, len(self.state[subnet]), len({ip for ip, *_ in self.state[subnet]}))
+                for subnet in sorted(self.state, key=order)]
+
+
+def summary_names():
+    """The registered reducers that can be picked with --summaries."""
+    return [name for name, cls in REDUCERS.items() if issubclass(cls, Summary)]
+
+
+class Reducers(object):
+    """The reducers of one run: the built-in ones plus any selected with --summaries.
+
+    populate_dictionaries feeds every record to all of them, and partial
+    results from --jobs or the parse cache are merged reducer by reducer.
+    """
+
+    def __init__(self, names=()):
+        self.reducers = {name: REDUCERS[name]() for name in BUILTIN}
+        for name in names:
+            if name not in self.reducers:
+                self.reducers[name] = REDUCERS[name]()
+
+    def __getitem__(self, name):
+        return self.reducers[name]
+
+    def __iter__(self):
+        return iter(self.reducers.values())
+
+    def add(self, reducer):
+        """Adds an unregistered reducer for this run only, e.g. --follow's change tracker."""
+        self.reducers[reducer.name] = reducer
+
+    def names(self):
+        return list(self.reducers)
+
+    def summaries(self):
+        """The reducers that write a summary file."""
+        return [reducer for reducer in self if isinstance(reducer, Summary)]
+
+    def updaters(self):
+        """The bound update methods, looked up once for the per-record loop."""
+        return [reducer.update for reducer in self]
+
+    def merge(self, other, kept=None):
+        for name, reducer in other.reducers.items():
+            if name not in self.reducers:
+                self.reducers[name] = REDUCERS[name]()
+            self.reducers[name].merge(reducer, kept)
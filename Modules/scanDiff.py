@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import os
+from collections import namedtuple
+
+from Modules.ipIndex import ip_key
+from Modules.records import ServiceRecord
+from Modules.streamParse import iter_hosts
+
+
+ScanIndex = namedtuple('ScanIndex', ['hosts', 'services'])
+ScanDiff = namedtuple('ScanDiff', ['added_hosts', 'removed_hosts',
+                                   'added', 'removed', 'changed'])
+
+
+def index_scan(file):
+    """Indexes the open ports of a scan on (ip, port, protocol).
+
+    The file is read with the streaming parser, so only the index is kept in
+    memory, not the XML tree or libnmap objects.
+
+    Args:
+        file: The Nmap XML file.
+
+    Returns:
+        A ScanIndex of IP -> hostnames and (ip, port, protocol) -> ServiceRecord.
+    """
+    hosts, services = {}, {}
+    for host in iter_hosts(file):
+        ip = str(host.address)
+        hostnames = hosts.setdefault(ip, [])
+        hostnames.extend(name for name in host.hostnames if name not in hostnames)
+        for service in host.services:
+            if service.state == "open":
+                record = ServiceRecord(ip, str(service.port), service.protocol,
+                                       service.service, service.banner)
+                services.setdefault((ip,) + record.key, record)
+    return ScanIndex(hosts, services)
+
+
+def fingerprint(record):
+    """What has to match for a port to count as unchanged."""
+    return record.service, record.product, record.version
+
+
+def diff_scans(old, new):
+    """Compares two ScanIndexes with one pass over each.
+
+    Returns:
+        A ScanDiff. added/removed are lists of ServiceRecords and changed a
+        list of (old, new) ServiceRecord pairs, all ordered by IP, port and
+        protocol.
+    """
+    added, changed = [], []
+    for key, record in new.services.items():
+        before = old.services.get(key)
+        if before is None:
+            added.append(record)
+        elif fingerprint(before) != fingerprint(record):
+            changed.append((before, record))
+    removed = [record for key, record in old.services.items() if key not in new.services]
+
+    # IPs sort by address like every other output, each parsed only once
+    keys = {ip: ip_key(ip) for ip in set(old.hosts) | set(new.hosts)}
+
+    def order(record):
+        return keys[record.ip], int(record.port), record.protocol
+
+    return ScanDiff(sorted((ip for ip in new.hosts if ip not in old.hosts), key=keys.get),
+                    sorted((ip for ip in old.hosts if ip not in new.hosts), key=keys.get),
+                    sorted(added, key=order), sorted(removed, key=order),
+                    sorted(changed, key=lambda pair: order(pair[1])))
+
+
+def describe(record):
+    """The product and version of a record, e.g. 'nginx 1.18.0'."""
+    return f"{record.product} {record.version}"
+
+
+def port_line(record):
+    """A port in the same '[*] port protocol service' form as hosts.txt."""
+    return f"[*] {record.port} {record.protocol} {record.service}"
+
+
+def write_diff(diff, old_file, new_file):
+    """Writes the diff to ./output/ as scan-diff.txt, .csv and .json.
+
+    Returns:
+        Nothing
+    """
+    if not os.path.exists("./output/"):
+        os.mkdir("./output/")
+
+    by_ip = {}
+    for record in diff.added:
+        by_ip.setdefault(record.ip, []).append(f"+ {port_line(record)} ({describe(record)})")
+    for record in diff.removed:
+        by_ip.setdefault(record.ip, []).append(f"- {port_line(record)} ({describe(record)})")
+    for before, after in diff.changed:
+        by_ip.setdefault(after.ip, []).append(
+            f"~ {port_line(after)} ({describe(before)} -> {describe(after)})")
+
+    lines = [f"Old scan: {old_file}", f"New scan: {new_file}", "",
+             "---New Hosts---"] + (diff.added_hosts or ["None"])
+    lines += ["", "---Missing Hosts---"] + (diff.removed_hosts or ["None"])
+    for ipaddr in sorted(by_ip, key=ip_key):
+        lines += ["", "=" * 20, f"[+] {ipaddr}", ""] + by_ip[ipaddr]
+    with open('./output/scan-diff.txt', 'w') as out:
+        out.write("\n".join(lines) + "\n")
+
+    rows = [("new host", ip, "", "", "", "", "") for ip in diff.added_hosts]
+    rows += [("missing host", ip, "", "", "", "", "") for ip in diff.removed_hosts]
+    rows += [("added", record.ip, record.port, record.protocol, record.service,
+              "", describe(record)) for record in diff.added]
+    rows += [("removed", record.ip, record.port, record.protocol, record.service,
+              describe(record), "") for record in diff.removed]
+    rows += [("changed", after.ip, after.port, after.protocol, after.service,
+              describe(before), describe(after)) for before, after in diff.changed]
+    # Product and version strings may contain commas, so quote as needed
+    with open('./output/scan-diff.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, lineterminator="\n")
+        writer.writerow(("Change", "IP", "Port", "Protocol", "Service", "Old", "New"))
+        writer.writerows(rows)
+
+    def as_dict(record):
+        return {'ip': record.ip, 'port': record.port, 'protocol': record.protocol,
+                'service': record.service, 'product': record.product,
+                'version': record.version}
+
+    with open('./output/scan-diff.json', 'w') as jsonfile:
+        json.dump({'old': old_file, 'new': new_file,
+                   'new_hosts': diff.added_hosts, 'missing_hosts': diff.removed_hosts,
+                   'added': [as_dict(record) for record in diff.added],
+                   'removed': [as_dict(record) for record in diff.removed],
+                   'changed': [{'old': as_dict(before), 'new': as_dict(after)}
+                               for before, after in diff.changed]},
+                  jsonfile, indent=2)
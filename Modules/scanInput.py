@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+from contextlib import ExitStack, contextmanager
+
+
+# The file name that reads the scan from standard input
+STDIN = '-'
+# Plain files at least this large are memory mapped instead of read
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+MAGIC_SIZE = 6
+MAGIC = [(b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'),
+         (b'\x28\xb5\x2f\xfd', 'zstd')]
+
+
+# The decompressors are imported when a scan needs them, not on every run
+
+def gzip_reader(raw):
+    import gzip
+    return gzip.GzipFile(fileobj=raw)
+
+
+def bz2_reader(raw):
+    import bz2
+    return bz2.BZ2File(raw)
+
+
+def xz_reader(raw):
+    import lzma
+    return lzma.LZMAFile(raw)
+
+
+def zstd_reader(raw):
+    """A streaming zstd decompressor, from the standard library or zstandard."""
+    try:
+        from compression import zstd
+        return zstd.ZstdFile(raw)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compressed scans need the zstandard package "
+                         "(python3 -m pip install zstandard)")
+    return zstandard.ZstdDecompressor().stream_reader(raw)
+
+
+READERS = {'gzip': gzip_reader,
+           'bz2': bz2_reader,
+           'xz': xz_reader,
+           'zstd': zstd_reader}
+
+
+def detect(magic):
+    """The compression format the leading bytes of a file belong to, or 'plain'."""
+    for prefix, name in MAGIC:
+        if magic.startswith(prefix):
+            return name
+    return 'plain'
+
+
+def peek(file):
+    """The first bytes of a scan file, or of stdin without consuming them."""
+    if file == STDIN:
+        return sys.stdin.buffer.peek(MAGIC_SIZE)[:MAGIC_SIZE]
+    with open(file, 'rb') as raw:
+        return raw.read(MAGIC_SIZE)
+
+
+def is_plain_file(file):
+    """True for an uncompressed file on disk, which libnmap can read by path."""
+    return file != STDIN and detect(peek(file)) == 'plain'
+
+
+@contextmanager
+def open_scan(file):
+    """Opens a scan for binary reading, however it is stored.
+
+    gzip, bz2, xz and zstd files are recognised by their leading bytes and
+    decompressed as they are read, never to disk. '-' reads standard input,
+    which may be compressed as well. Large plain files are memory mapped.
+
+    Args:
+        file: The path of the scan, or '-' for stdin.
+
+    Yields:
+        A binary file-like object of the XML.
+    """
+    with ExitStack() as stack:
+        if file == STDIN:
+            raw = sys.stdin.buffer
+        else:
+            raw = stack.enter_context(open(file, 'rb'))
+        kind = detect(peek(file))
+        if kind != 'plain':
+            yield stack.enter_context(READERS[kind](raw))
+        elif file != STDIN and os.fstat(raw.fileno()).st_size >= MMAP_THRESHOLD:
+            import mmap
+            yield stack.enter_context(mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            yield raw
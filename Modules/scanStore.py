@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import re
+import shlex
+import sqlite3
+from collections.abc import Mapping
+
+from Modules.records import ServiceRecord
+
+
+# Rows buffered before they are written in one transaction
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (ip TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS hostnames (ip TEXT NOT NULL, hostname TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS hostnames_ip ON hostnames (ip);
+CREATE INDEX IF NOT EXISTS hostnames_hostname ON hostnames (hostname);
+CREATE TABLE IF NOT EXISTS ports (
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    protocol TEXT NOT NULL,
+    service TEXT NOT NULL,
+    banner TEXT NOT NULL,
+    product TEXT NOT NULL,
+    version TEXT NOT NULL,
+    UNIQUE (ip, port, protocol)
+);
+CREATE INDEX IF NOT EXISTS ports_port ON ports (port, protocol);
+CREATE INDEX IF NOT EXISTS ports_service ON ports (service);
+CREATE INDEX IF NOT EXISTS ports_product ON ports (product COLLATE NOCASE);
+"""
+
+# Port counts are derived from the deduplicated ports rows, so they can't
+# drift when the same scan is stored again: each IP counts once per port,
+# where the in-memory port_count counts every time the port was seen open.
+# A port's protocol is the one of its first row, like the port_count dictionary.
+PORT_COUNTS = ("SELECT CAST(port AS TEXT), protocol, COUNT(*), MIN(rowid) AS first "
+               "FROM ports {where} GROUP BY port")
+
+QUERY_HELP = ("Queries look like: 'port 445/tcp', 'service http', "
+              "'product OpenSSH < 8', 'product \"Apache httpd\" >= 2.4' "
+              "or 'hostname www.example.com'")
+
+COMPARISONS = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '=': lambda a, b: a == b,
+    '==': lambda a, b: a == b,
+}
+
+
+def version_key(version):
+    """Turns a version string like '8.2p1' into (8, 2, 1) for comparisons."""
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+
+class StoreView(Mapping):
+    """A read-only dict-like view over the store.
+
+    Lets the existing outputs, which were written against the in-memory
+    dictionaries, render straight from the database one key at a time.
+    """
+
+    def __init__(self, keys, lookup):
+        self._keys = keys
+        self._lookup = lookup
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return self._keys()
+
+    def __len__(self):
+        return sum(1 for _ in self._keys())
+
+
+class ScanStore(object):
+    """SQLite store for parsed scan results.
+
+    Holds the same data as the ips/ports/port_count/services dictionaries,
+    with one row per host, hostname and open port; port counts are worked
+    out from the ports rows. Each (ip, port, protocol) is kept once, so -v
+    has no effect on the store and a port seen on the same IP in several
+    files counts once.
+    """
+
+    def __init__(self, path):
+        # The output sinks read from worker threads once parsing is done
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.hosts = []
+        self.hostnames = []
+        self.ports = []
+
+    def add_host(self, ip, hostnames):
+        self.hosts.append((ip,))
+        self.hostnames.extend((ip, hostname) for hostname in hostnames if hostname)
+        self.flush_if_full()
+
+    def add_service(self, record):
+        self.ports.append((record.ip, int(record.port), record.protocol,
+                           record.service, record.banner,
+                           record.product, record.version))
+        self.flush_if_full()
+
+    def flush_if_full(self):
+        if len(self.hostnames) + len(self.ports) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered rows in a single transaction."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO hosts VALUES (?)", self.hosts)
+            self.connection.executemany(
+                "INSERT INTO hostnames SELECT ?1, ?2 WHERE NOT EXISTS "
+                "(SELECT 1 FROM hostnames WHERE ip = ?1 AND hostname = ?2)", self.hostnames)
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO ports VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self.ports)
+        self.hosts, self.hostnames, self.ports = [], [], []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def rows(self, sql, args=()):
+        return self.connection.execute(sql, args)
+
+    def records(self, where, args=()):
+        """Yields a ServiceRecord for every ports row matching the WHERE clause."""
+        for ip, port, protocol, service, banner in self.rows(
+                "SELECT ip, port, protocol, service, banner FROM ports "
+                f"WHERE {where} ORDER BY rowid", args):
+            yield ServiceRecord(ip, str(port), protocol, service, banner)
+
+    def ips_view(self):
+        """The store as the ips dictionary: IP -> list of unique hostnames"""
+        def keys():
+            return (ip for ip, in self.rows("SELECT ip FROM hosts ORDER BY rowid"))
+
+        def lookup(ip):
+            hostnames = [hostname for hostname, in self.rows(
+                "SELECT hostname FROM hostnames WHERE ip = ? ORDER BY rowid", (ip,))]
+            if hostnames or self.rows("SELECT 1 FROM hosts WHERE ip = ?", (ip,)).fetchone():
+                return hostnames
+            return None
+        return StoreView(keys, lookup)
+
+    def ports_view(self):
+        """The store as the ports dictionary: IP -> list of ServiceRecords"""
+        def keys():
+            return (ip for ip, in self.rows(
+                "SELECT ip FROM ports GROUP BY ip ORDER BY MIN(rowid)"))
+
+        def lookup(ip):
+            return list(self.records("ip = ?", (ip,))) or None
+        return StoreView(keys, lookup)
+
+    def port_count_view(self):
+        """The store as the port_count dictionary: port -> protocol and count"""
+        def keys():
+            return (row[0] for row in self.rows(
+                PORT_COUNTS.format(where='') + " ORDER BY first"))
+
+        def lookup(port):
+            if not str(port).isdigit():
+                return None
+            row = self.rows(PORT_COUNTS.format(where='WHERE port = ?'), (int(port),)).fetchone()
+            if row is None:
+                return None
+            return {'protocol': row[1], 'count': row[2]}
+        return StoreView(keys, lookup)
+
+    def services_view(self):
+        """The store as the services dictionary: service -> {'details': records}"""
+        def keys():
+            return (service for service, in self.rows(
+                "SELECT service FROM ports GROUP BY service ORDER BY MIN(rowid)"))
+
+        def lookup(service):
+            if self.rows("SELECT 1 FROM ports WHERE service = ? LIMIT 1",
+                         (service,)).fetchone() is None:
+                return None
+            return {'details': self.records("service = ?", (service,))}
+        return StoreView(keys, lookup)
+
+    def query(self, text):
+        """Answers a query from the indexes without re-parsing any XML.
+
+        Args:
+            text: The query, see QUERY_HELP.
+
+        Returns:
+            A list of matching ServiceRecords.
+
+        Raises:
+            ValueError: If the query can't be understood.
+        """
+        try:
+            words = shlex.split(text)
+        except ValueError:
+            raise ValueError(QUERY_HELP) from None
+        if len(words) < 2:
+            raise ValueError(QUERY_HELP)
+        kind, value = words[0].lower(), words[1]
+
+        if kind == 'port' and len(words) == 2:
+            port, _, protocol = value.partition('/')
+            if not port.isdigit():
+                raise ValueError(QUERY_HELP)
+            if protocol:
+                return list(self.records("port = ? AND protocol = ?", (int(port), protocol)))
+            return list(self.records("port = ?", (int(port),)))
+
+        if kind == 'service' and len(words) == 2:
+            return list(self.records("service = ?", (value,)))
+
+        if kind == 'hostname' and len(words) == 2:
+            return list(self.records(
+                "ip IN (SELECT ip FROM hostnames WHERE hostname = ?)", (value,)))
+
+        if kind == 'product':
+            # Product names can have several words; a trailing comparison
+            # and version filter them, e.g. product Apache httpd >= 2.4
+            compare = None
+            if len(words) >= 4 and words[-2] in COMPARISONS:
+                compare, wanted = COMPARISONS[words[-2]], version_key(words[-1])
+                words = words[:-2]
+            records = self.records("product = ? COLLATE NOCASE", (' '.join(words[1:]),))
+            if compare is None:
+                return list(records)
+            return [record for record in records
+                    if version_key(record.version) and
+                    compare(version_key(record.version), wanted)]
+
+        raise ValueError(QUERY_HELP)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import os
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+from Modules.ipIndex import IPIndex
+from Modules.profiler import NullProfiler, active_profiler
+
+
+# Everything the outputs render from. Built once after parsing and shared,
+# read-only, by all sinks.
+ScanModel = namedtuple('ScanModel', ['ips', 'ports', 'port_count', 'services',
+                                     'breached_creds', 'options', 'template', 'matrix',
+                                     'index', 'spill', 'summaries'])
+
+SINKS = {}
+
+
+def register_sink(name):
+    """Class decorator that registers an output sink under the given name."""
+    def register(cls):
+        cls.name = name
+        SINKS[name] = cls
+        return cls
+    return register
+
+
+def read_only_model(ips, ports, port_count, services, breached_creds, options, template,
+                    matrix=None, index=None, spill=None, summaries=()):
+    if index is None:
+        index = IPIndex(ips)
+    return ScanModel(MappingProxyType(ips), MappingProxyType(ports),
+                     MappingProxyType(port_count), MappingProxyType(services),
+                     MappingProxyType(breached_creds), options, template, matrix, index, spill,
+                     tuple(summaries))
+
+
+class Sink(ABC):
+    """An output format.
+
+    Subclasses write their file(s) with as few large writes as possible and
+    send anything meant for the terminal to self.console instead of
+    printing, so sinks can run side by side without mixing their output.
+    Item counts stored in self.counts end up in the --profile metrics.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.console = io.StringIO()
+        self.counts = {}
+
+    @abstractmethod
+    def write(self, model):
+        """Writes this output from the ScanModel."""
+
+
+@register_sink('appendix')
+class AppendixSink(Sink):
+    def write(self, model):
+        with active_profiler().phase('output:appendix:load'):
+            # python-docx is only loaded when the appendix is wanted
+            from docx import Document
+            from Modules.generateAppendix import AppendixGenerator
+            document = Document(model.template)
+        AppendixGenerator(model.options).export_doc(
+            model.breached_creds, model.ips, model.ports, document, model.index)
+        self.counts['rows'] = len(model.breached_creds) + len(model.ips) + sum(
+            len(records) for records in model.ports.values())
+
+
+@register_sink('csv')
+class CsvSink(Sink):
+    def write(self, model):
+        from Modules.export import exportCsv
+        print("[+] Writing listening services CSV file", file=self.console)
+        exportCsv(model.port_count)
+        self.counts['rows'] = len(model.port_count)
+        print("[!] Done. Listening Services CSV written to ./output/listening-services.csv",
+              file=self.console)
+
+
+@register_sink('matrix')
+class MatrixSink(Sink):
+    """Cross-host port reports computed from the --matrix PortMatrix."""
+
+    def write(self, model):
+        matrix = model.matrix
+        labels = [f"{port}/{protocol}" for port, protocol in matrix.columns]
+
+        print("[+] Writing port matrix reports", file=self.console)
+        cooccurrence = matrix.cooccurrence().tolist()
+        lines = ["port," + ",".join(labels)]
+        lines += [f"{label}," + ",".join(map(str, row))
+                  for label, row in zip(labels, cooccurrence)]
+        with open("./output/port-cooccurrence.csv", "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        lines = []
+        for keys, profile_ips in matrix.profiles():
+            ports = ", ".join(f"{port}/{protocol}" for port, protocol in keys) or "(none)"
+            lines.append(f"{len(profile_ips)} host(s): {ports}")
+            lines += [f"\t{ip}" for ip in profile_ips]
+        with open("./output/port-profiles.txt", "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        subnets, counts = matrix.subnet_counts()
+        lines = ["subnet," + ",".join(labels)]
+        lines += [f"{subnet}," + ",".join(map(str, row))
+                  for subnet, row in zip(subnets, counts.tolist())]
+        with open("./output/subnet-ports.csv", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print("[!] Done. Port matrix reports written to ./output/port-cooccurrence.csv, "
+              "./output/port-profiles.txt and ./output/subnet-ports.csv", file=self.console)
+
+
+@register_sink('summaries')
+class SummariesSink(Sink):
+    """The CSV files of the --summaries reducers."""
+
+    def write(self, model):
+        for reducer in model.summaries:
+            rows = reducer.rows()
+            # Product names and versions may contain commas, so quote as needed
+            with open(f"./output/{reducer.filename}", "w", newline="") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(reducer.header)
+                writer.writerows(rows)
+            self.counts[reducer.name] = len(rows)
+            print(f"[!] Done. {reducer.name} summary written to ./output/{reducer.filename}",
+                  file=self.console)
+
+
+def worker_pool(jobs):
+    """A process pool whose workers aren't forked from the calling process.
+
+    Pools started while sinks are running, like the appendix workers or the
+    query server's, could otherwise fork a child that inherits a lock one
+    of the sink threads holds. Workers are started by a fork server (or
+    spawned where there is none) instead.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(method))
+
+
+def run_sinks(model, names, profiler=None):
+    """Runs the named sinks concurrently in a thread pool.
+
+    Console output is printed once all sinks are done, in the order the
+    sinks were named, so it reads the same as a serial run.
+
+    Args:
+        model: The ScanModel to render.
+        names: The registered sink names to run.
+        profiler: Optional Profiler recording an output:<name> phase per
+            sink. When it dumps cProfile stats the sinks run one at a time,
+            since cProfile can't separate threads running side by side, and
+            their peak memory is recorded too.
+
+    Returns:
+        Nothing
+    """
+    if not os.path.exists("./output/"):
+        os.mkdir("./output/")
+
+    profiler = profiler or NullProfiler()
+
+    def write(sink):
+        with profiler.phase(f"output:{sink.name}", thread=True) as counts:
+            sink.write(model)
+            counts.update(sink.counts)
+
+    sinks = [SINKS[name]() for name in names]
+    workers = 1 if profiler.dump_dir else max(len(sinks), 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(write, sink) for sink in sinks]
+        for future in futures:
+            future.result()
+    for sink in sinks:
+        print(sink.console.getvalue(), end="")
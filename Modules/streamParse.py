@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import xml.etree.ElementTree as ET
+
+from Modules.scanInput import open_scan
+
+
+# Bytes read from a followed file per poll
+FOLLOW_CHUNK_SIZE = 1024 * 1024
+
+# Same banner rules libnmap uses, so both parse paths produce identical output
+NOT_RELEVANT = ["name", "method", "conf", "cpelist", "servicefp", "tunnel"]
+RELEVANT = ["product", "version", "extrainfo"]
+
+
+class StreamService(object):
+    """A lightweight stand-in for libnmap's NmapService, built from a <port> element"""
+
+    def __init__(self, element):
+        self.port = int(element.get('portid', -1))
+        self.protocol = element.get('protocol')
+        self.state = None
+        self.reason = ''
+        self._service = {}
+
+        state = element.find('state')
+        if state is not None:
+            self.state = state.get('state')
+            self.reason = state.get('reason', '')
+
+        service = element.find('service')
+        if service is not None:
+            self._service = dict(service.attrib)
+
+    @property
+    def service(self):
+        return self._service.get('name', '')
+
+    @property
+    def banner(self):
+        b = ""
+        if self._service.get('method') == 'probed':
+            for key in RELEVANT:
+                if key in self._service:
+                    b += f"{key}: {self._service[key]} "
+            for key in self._service:
+                if key not in NOT_RELEVANT and key not in RELEVANT:
+                    b += f"{key}: {self._service[key]} "
+        return b.rstrip()
+
+    def get_dict(self):
+        """Returns the same dictionary as NmapService.get_dict()"""
+        return {
+            'id': f"{self.protocol}.{self.port}",
+            'port': str(self.port),
+            'protocol': self.protocol,
+            'banner': self.banner,
+            'service': self.service,
+            'state': self.state,
+            'reason': self.reason,
+        }
+
+
+class StreamHost(object):
+    """A lightweight stand-in for libnmap's NmapHost, built from a <host> element"""
+
+    def __init__(self, element):
+        ipv4 = ipv6 = None
+        for address in element.iter('address'):
+            if address.get('addrtype') == 'ipv4':
+                ipv4 = address.get('addr')
+            elif address.get('addrtype') == 'ipv6':
+                ipv6 = address.get('addr')
+        self.address = ipv4 or ipv6 or ''
+        self.hostnames = [hostname.get('name')
+                          for hostname in element.iter('hostname')]
+        self.services = [StreamService(port) for port in element.iter('port')]
+
+
+def iter_hosts(file):
+    """Yields hosts from an Nmap XML file one at a time.
+
+    Each <host> element is converted as soon as it has been read and is then
+    dropped from the tree, so memory use stays flat regardless of file size.
+
+    Args:
+        file: The path of the Nmap XML file to parse, which may be
+              compressed, or '-' for stdin.
+
+    Returns:
+        A generator of StreamHost objects.
+    """
+    with open_scan(file) as source:
+        context = ET.iterparse(source, events=('start', 'end'))
+        _, root = next(context)
+        for event, element in context:
+            if event == 'end' and element.tag == 'host':
+                yield StreamHost(element)
+                root.clear()
+
+
+def follow_hosts(file, on_idle=None, interval=1.0):
+    """Yields hosts from an Nmap XML file that is still being written.
+
+    The file is tailed and fed to an incremental parser, so each <host> is
+    yielded as soon as nmap has flushed it. Following stops once the closing
+    </nmaprun> tag is read, or on Ctrl-C.
+
+    Args:
+        file: The path of the -oX file nmap is writing.
+        on_idle: Called when there's no new data yet, and at least once every
+                 interval seconds while data keeps coming in.
+        interval: Seconds between polls of the file.
+
+    Returns:
+        A generator of StreamHost objects.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    last_idle = time.monotonic()
+    try:
+        while not os.path.exists(file):
+            time.sleep(interval)
+        with open(file, 'rb') as xml_file:
+            while True:
+                chunk = xml_file.read(FOLLOW_CHUNK_SIZE)
+                if chunk:
+                    parser.feed(chunk)
+                    for event, element in parser.read_events():
+                        if event == 'start' and root is None:
+                            root = element
+                        elif event == 'end' and element.tag == 'host':
+                            yield StreamHost(element)
+                            root.clear()
+                        elif event == 'end' and element is root:
+                            return
+                if on_idle is not None and (not chunk or time.monotonic() - last_idle >= interval):
+                    on_idle()
+                    last_idle = time.monotonic()
+                if not chunk:
+                    time.sleep(interval)
+    except KeyboardInterrupt:
+        return
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+from xml.sax.saxutils import escape
+
+from docx.oxml.ns import qn
+
+
+# Centered with 2pt before and after, same as the per-cell formatting the
+# appendix used to apply through python-docx
+PARAGRAPH_PROPERTIES = '<w:pPr><w:spacing w:before="40" w:after="40"/><w:jc w:val="center"/></w:pPr>'
+NOT_BOLD = '<w:rPr><w:b w:val="0"/></w:rPr>'
+# Between the values of a cell holding a list, e.g. an IP's hostnames
+LINE_BREAK = '<w:r><w:br/></w:r>'
+
+
+def run_xml(text, properties=''):
+    return f'<w:r>{properties}<w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+
+def cell_prefixes(table):
+    """The opening XML of a cell in each column of a table, with the column's width."""
+    prefixes = []
+    for col in table._tbl.tblGrid.gridCol_lst:
+        width = col.get(qn('w:w'))
+        tc_pr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>' if width else ''
+        prefixes.append(f'<w:tc>{tc_pr}<w:p>{PARAGRAPH_PROPERTIES}')
+    return prefixes
+
+
+def row_xml(cell_open, row):
+    """Renders one table row.
+
+    Args:
+        cell_open: The cell_prefixes() of the table.
+        row: The cells of the row. Each cell is either a string or a list
+             of strings, which are written one per line.
+
+    Returns:
+        The <w:tr> element as a string.
+    """
+    cells = []
+    for i, value in enumerate(row):
+        runs = [value] if isinstance(value, str) else value
+        properties = NOT_BOLD if i == 0 else ''
+        cells.append(cell_open[i] +
+                     LINE_BREAK.join(run_xml(text, properties) for text in runs) +
+                     '</w:p></w:tc>')
+    return '<w:tr>' + ''.join(cells) + '</w:tr>'
+
+
+def rows_xml(cell_open, rows):
+    """Renders a chunk of rows as one string, e.g. in a worker process."""
+    return ''.join(row_xml(cell_open, row) for row in rows)
+
+
+def paragraph_xml(text, style_id, space_after=None):
+    """Renders a paragraph the way document.add_paragraph(text, style) does.
+
+    Args:
+        text: The paragraph text.
+        style_id: The id (not the name) of the paragraph style.
+        space_after: Optional spacing after the paragraph in twentieths of a point.
+
+    Returns:
+        The <w:p> element as a string.
+    """
+    spacing = f'<w:spacing w:after="{space_after}"/>' if space_after is not None else ''
+    return f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/>{spacing}</w:pPr>{run_xml(text)}</w:p>'
@@ -13,11 +13,105 @@ Description:
 
     Options:
         -f/--file: The file[s] to parse. This option is required. Separate multiple XML files on the command line with a space. 
+                    gzip, bz2, xz and zstd compressed files are decompressed
+                    on the fly, and - reads the XML from stdin, e.g.
+                    nmap -oX - ... | python3 nmapParse.py -f -
+                    Both are always parsed host by host, as with -s.
         -q/--quiet: Suppresses the welcome banner and section headers.
         -p/--ports: Shows verbose port details beyond just port, protocol,
                     and service.
         -v/--verbose: Shows all the open ports from every host associated with
                     an IP address, even if there are duplicates.
+        -s/--stream: Parses the XML files host by host instead of loading the
+                    whole document first. Keeps memory flat on very large scans.
+        -j/--jobs: Parses multiple XML or Dehashed files in parallel using
+                    this many worker processes. The appendix sections and
+                    chunks of their rows are also built in parallel.
+        --cache-dir: Where parse results are cached between runs, so unchanged
+                    files aren't parsed again (default ./output/.cache).
+        --cache-size: The cache size cap in MB; least recently used entries
+                    are evicted past it.
+        --no-cache: Always parse every file and don't touch the cache.
+        --db: Writes the parsed results into this SQLite database and renders
+                    the outputs from it. Without -f, renders from an existing
+                    database. Each IP is stored once per port, so the CSV
+                    port counts count hosts and storing a scan again doesn't
+                    change them.
+        --follow: Follows a -oX file nmap is still writing. Each host is parsed
+                    as soon as nmap flushes it and ./output/ is kept up to
+                    date; the full outputs are written once the scan ends.
+        --query: Answers a query from the --db indexes and exits, e.g.
+                    "port 445/tcp", "service http", "product OpenSSH < 8",
+                    "product Apache httpd >= 2.4" or "hostname www.example.com".
+                    Product names can be quoted.
+        --only: Comma separated list of the outputs to write, e.g. csv,hosts.
+                    Outputs that aren't selected are skipped along with the
+                    libraries only they need. Choose from appendix, hosts,
+                    ips, hostnames, csv and services (default: all). The
+                    selected outputs are written concurrently.
+        --dump: Also prints the full ips and ports dictionaries, for
+                    debugging. Off by default, on large scans it prints
+                    megabytes.
+        --matrix: Builds a NumPy hosts x ports matrix after parsing. The
+                    CSV port counts come from it (each host counted once) and
+                    port co-occurrence, port profile and per-/24 reports are
+                    written to ./output/. Needs numpy.
+        --profile: Records wall and CPU time, item counts, throughput and
+                    peak memory for every phase and output, and writes them to
+                    this JSON file (default ./output/metrics.json). Parsing is
+                    split into XML parsing, hostnames, records (with their
+                    banners), dedup and reducers (not inside -j workers), and
+                    hosts.txt into sorting and writing. Memory tracing slows
+                    the run down noticeably.
+        --profile-dump: With --profile, also writes a cProfile .prof file per
+                    phase to this directory. The outputs are then written one
+                    at a time instead of concurrently.
+        --split-hosts: Also writes hosts.txt split per subnet of this prefix
+                    length (e.g. 24) to ./output/hosts/. IPv6 hosts are
+                    split per /64.
+        --ips-for: Prints the IPs a hostname was seen on. With --db, use
+                    --query "hostname NAME" instead.
+        --hosts-in: Prints the hosts inside a CIDR range, e.g. 10.0.1.0/24
+                    or 2001:db8::/32.
+        --scan: Runs a built-in TCP connect scan of these comma separated IPs
+                    and CIDR ranges and feeds the results straight into the
+                    outputs, no XML needed. Up to 1048576 addresses (a /12).
+                    --scan-ports, --scan-concurrency, --scan-timeout,
+                    --scan-rate (connections per second per host) and
+                    --scan-banners tune it.
+        --max-memory: Bounded memory mode for huge scans. Parsed records are
+                    sorted in temporary run files once this many MB are
+                    buffered, and hosts.txt, all-services.txt and the IP and
+                    hostname lists are written from a k-way merge of them.
+                    Streams the XML; no appendix. all-services.txt is then
+                    ordered by service name and IP.
+        --spill-dir: Where --max-memory puts its run files (default: the
+                    system temp directory).
+        --serve: Runs a query server on this loopback HOST:PORT or unix
+                    socket path (default 127.0.0.1:8642) that keeps the -f
+                    and -d files parsed in memory. Clients send one JSON
+                    request per line, e.g.
+                    {"op": "hosts", "port": "445/tcp"}
+                    {"op": "services", "name": "http"}
+                    {"op": "port_count"}
+                    {"op": "hostnames", "ip": "10.0.0.1"}
+                    {"op": "ingest", "files": ["more.xml"], "dehashed": []}
+                    {"op": "render", "only": ["hosts", "csv"]}
+                    and get one JSON line back. ingest parses new files with
+                    -j workers while queries keep being answered; a file
+                    ingested again replaces its earlier contents. render
+                    writes ./output/ from the current model. File paths are
+                    relative to where the server was started.
+        --diff: Compares an old and a new scan, OLD.xml NEW.xml, and writes
+                    the new and missing hosts, opened and closed ports and
+                    changed service versions to ./output/scan-diff.txt, .csv
+                    and .json.
+        --hosts-with: Prints the hosts that have all of these ports open,
+                    e.g. 22/tcp,445/tcp. Implies --matrix.
+        --summaries: Comma separated extra aggregations computed in the same
+                    pass as the parse and written to ./output/: products
+                    (hosts per product and version), subnets (open ports and
+                    hosts per /24) and top-services (services by host count).
 
 Author:
     Tom Fieber (@tomfieber)
@@ -25,22 +119,44 @@ Author:
 """
 
 import argparse
-from libnmap.parser import NmapParser
-from termcolor import colored
-from docx import Document
-from Modules.export import exportCsv
-from Modules.generateAppendix import AppendixGenerator
-from Modules.keyFunctions import split_banner
-from Modules.parseDehashed import ParseDehashed
+import atexit
+import io
+from Modules.export import WRITE_BUFFER, exportCsv
+from Modules.hostnameIndex import HostnameIndex
+from Modules.indexes import IndexedList
+from Modules.ipIndex import IPIndex
+from Modules.keyFunctions import parse_banner
+from Modules.profiler import NullProfiler, Profiler, active_profiler, set_active_profiler
+from Modules.records import ServiceRecord
+from Modules.reducers import Reducer, Reducers, summary_names
+from Modules.scanInput import STDIN, is_plain_file
+from Modules.sinks import Sink, read_only_model, register_sink, run_sinks
+from Modules.streamParse import follow_hosts, iter_hosts
 import os
+import sys
+import time
+
+# libnmap, python-docx, termcolor, sqlite3, multiprocessing, numpy and the
+# parse cache are imported where they're used, so a run only loads what its
+# selected phases need.
+
+OUTPUTS = ['appendix', 'hosts', 'ips', 'hostnames', 'csv', 'services']
+SERVICES_HEADER = "---List of All Hosts by Service---\n\n"
+
+
+def colored(text, *args, **kwargs):
+    """termcolor.colored, imported on first use."""
+    from termcolor import colored as termcolor_colored
+    return termcolor_colored(text, *args, **kwargs)
 
 
 class NParse(object):
     """Parses an Nmap XML file"""
 
-    def __init__(self, file, options=None):
+    def __init__(self, file, options=None, on_idle=None):
         self.file = file
         self.options = options
+        self.on_idle = on_idle
 
     def check_open(self, state):
         """Checks if a port is open.
@@ -53,133 +169,255 @@ class NParse(object):
         """
         return state == "open"
 
-    def populate_dictionaries(self, ips, pd, pc, srvc):
+    def get_hosts(self):
+        """Gets the hosts from the XML file.
+
+        Returns:
+            A generator of hosts when streaming, following or reading a
+            compressed file or stdin, the scanned hosts with --scan
+            (self.file is then the targets), otherwise the libnmap hosts list.
+        """
+        if getattr(self.options, 'scan', None):
+            from Modules.portScanner import scan_hosts
+            return scan_hosts(self.file, self.options)
+        if getattr(self.options, 'follow', False):
+            return follow_hosts(self.file, self.on_idle)
+        if getattr(self.options, 'stream', False):
+            return iter_hosts(self.file)
+        # libnmap needs the whole document as one string, so compressed files
+        # and stdin are streamed instead of being decompressed into memory
+        if not is_plain_file(self.file):
+            return iter_hosts(self.file)
+        from libnmap.parser import NmapParser
+        return NmapParser.parse_fromfile(self.file).hosts
+
+    def get_records(self, ip, host):
+        """Builds a compact record for every open port on a host.
+
+        Args:
+            ip: The host's IP address.
+            host: The host from get_hosts().
+
+        Returns:
+            A generator of ServiceRecords.
+        """
+        for service in host.services:
+            if self.check_open(service.state):
+                yield ServiceRecord(ip, str(service.port), service.protocol,
+                                    service.service, service.banner)
+
+    def populate_dictionaries(self, ips, pd, reducers):
         """Parses data from the XML file and stores it in dictionaries for later use.
 
         Args:
-            ips: The dictionary you plan to use to store IPs and hostnames.
+            ips: The HostnameIndex you plan to use to store IPs and hostnames.
             pd: The dictionary for storing port details
-            pc: The dictionary for storing a count of open ports across all hosts.
+            reducers: The Reducers updated with every open port, including
+                the port_count and services dictionaries.
 
         Returns:
             Doesn't return anything, but all dictionaries will be populated.
         """
-        nmap_parse = NmapParser.parse_fromfile(self.file)
-        for host in nmap_parse.hosts:
+        verbose = getattr(self.options, 'verbose', False)
+        updaters = reducers.updaters()
+        profiler = active_profiler()
+        # The steps are interleaved for every host and port, so each lap adds
+        # the time since the previous one to its step. The laps do nothing
+        # unless --profile is used.
+        steps = profiler.steps()
+        lap = steps.lap
+        misses = parse_banner.cache_info().misses
+        for host in self.get_hosts():
+            lap('xml')
             ip = str(host.address)
-            if host.hostnames:
-                hostname = host.hostnames[0]
-            else:
-                hostname = ''
-            if ip not in ips.keys():
-                ips[ip] = [hostname]
-            else:
-                ips[ip].append(hostname)
-
-            # Get a dictionary object of all service details
-            for service in host.services:
-
-                svcDetails = service.get_dict()
-                svcPort = svcDetails['port']
-                svcState = svcDetails['state']
-                svcName = svcDetails['service']
-                svcProtocol = svcDetails['protocol']
-                banner = svcDetails['banner']
-                svcProduct, svcVersion = split_banner(banner)
-
-                port_is_open = self.check_open(svcState)
-
-                if port_is_open:
-
-                    # Get a count of all ports across hosts
-                    if svcPort not in pc.keys():
-                        pc[svcPort] = {'protocol': svcProtocol, 'count': 1}
-                    else:
-                        pc[svcPort]['count'] += 1
-
-                    # Create the list of listening ports
-                    if not verbose:
-                        if ip not in pd.keys():
-                            pd[ip] = [svcDetails]
-                        elif ip in pd.keys() and svcDetails not in pd[ip]:
-                            pd[ip].append(svcDetails)
-                        else:
-                            continue
-                    else:
-                        if ip not in pd.keys():
-                            pd[ip] = [svcDetails]
-                        else:
-                            pd[ip].append(svcDetails)
-
-                    details = (ip, svcPort, svcProtocol, svcProduct, svcVersion)
-                    if svcName not in srvc.keys():
-                        srvc[svcName] = {'details': [details]}
-                    elif svcName in srvc.keys() and details not in srvc[svcName]['details']:
-                        srvc[svcName]['details'].append(details)
+            ips.add(ip, host.hostnames)
+            lap('hostnames')
+
+            for record in self.get_records(ip, host):
+                lap('records')
+                # Create the list of listening ports
+                if ip not in pd.keys():
+                    pd[ip] = IndexedList()
+                if not verbose:
+                    new = pd[ip].add(record, record.key)
+                else:
+                    pd[ip].append(record)
+                    new = True
+                lap('dedup')
+
+                for update in updaters:
+                    update(ip, record, new)
+                lap('reducers')
+        lap('xml')
+
+        if profiler.enabled:
+            hosts, records = steps.laps['hostnames'], steps.laps['records']
+            profiler.add('parse:xml', steps.seconds['xml'], hosts=hosts)
+            profiler.add('parse:hostnames', steps.seconds['hostnames'], hosts=hosts)
+            profiler.add('parse:records', steps.seconds['records'], records=records,
+                         parsed=parse_banner.cache_info().misses - misses)
+            profiler.add('parse:dedup', steps.seconds['dedup'], records=records)
+            profiler.add('parse:reducers', steps.seconds['reducers'], records=records)
+
+    def populate_store(self, store):
+        """Parses data from the XML file and writes it into a ScanStore.
+
+        Args:
+            store: The ScanStore to write into.
+
+        Returns:
+            Doesn't return anything, but the store will be populated.
+        """
+        for host in self.get_hosts():
+            ip = str(host.address)
+            store.add_host(ip, host.hostnames)
+            for record in self.get_records(ip, host):
+                store.add_service(record)
+        store.flush()
+
+    def populate_spill(self, spill):
+        """Parses data from the XML file into a SpilledScan for --max-memory.
+
+        Args:
+            spill: The SpilledScan to add the hosts to.
+
+        Returns:
+            Doesn't return anything, but the SpilledScan will be populated.
+        """
+        for host in self.get_hosts():
+            ip = str(host.address)
+            spill.add_host(ip, host.hostnames, self.get_records(ip, host))
+
+
+def parse_file(file, options):
+    """Parses a single XML file into its own set of dictionaries.
+
+    This is the worker used by --jobs, so it must stay a top level function.
+    Unless --no-cache was given, unchanged files are loaded from the parse
+    cache instead.
+
+    Args:
+        file: The XML file to parse.
+        options: The command line options.
+
+    Returns:
+        A partial (ips, ports, reducers) tuple for this file.
+    """
+    from Modules.parseCache import ParseCache
+
+    cache = None
+    # stdin can't be fingerprinted, so it is never cached
+    if not options.no_cache and file != STDIN:
+        cache = ParseCache(options.cache_dir, options.cache_size)
+        partial = cache.get(file, options)
+        if partial is not None:
+            return partial
+
+    ips, pd, reducers = HostnameIndex(), {}, Reducers(options.summaries)
+    NParse(file, options).populate_dictionaries(ips, pd, reducers)
+    if cache is not None:
+        cache.put(file, options, (ips, pd, reducers))
+    return ips, pd, reducers
+
+
+def merge_dictionaries(partial, ips, pd, reducers, verbose=False):
+    """Merges a partial result from parse_file into the main dictionaries.
+
+    Partials must be merged in file order to match the serial output.
+
+    Args:
+        partial: The (ips, ports, reducers) tuple to merge.
+        ips: The HostnameIndex of IPs and hostnames.
+        pd: The dictionary of port details.
+        reducers: The Reducers to merge the partial's reducers into.
+        verbose: Keep duplicate port entries, same as -v.
+
+    Returns:
+        Doesn't return anything, but all dictionaries will be updated.
+    """
+    p_ips, p_pd, p_reducers = partial
+
+    ips.merge(p_ips)
+
+    # Ports already listed for an IP from an earlier file are skipped, and so
+    # are their service details, just like in populate_dictionaries
+    added = set()
+    for ip, details in p_pd.items():
+        if ip not in pd.keys():
+            pd[ip] = IndexedList()
+        for record in details:
+            if verbose:
+                pd[ip].append(record)
+            elif pd[ip].add(record, record.key):
+                added.add((ip,) + record.key)
+
+    reducers.merge(p_reducers,
+                   lambda record: verbose or (record.ip,) + record.key in added)
 
 
 class DisplayAll(object):
     """Displays port informtation from the provided XML files"""
 
-    def __init__(self, ip_dict, ports_dict, port_count_dict):
+    def __init__(self, ip_dict, ports_dict, port_count_dict, console=None, index=None):
         self.ips = ip_dict
         self.ports = ports_dict
         self.port_count = port_count_dict
+        # Where console output goes; None means stdout
+        self.console = console
+        # The shared sorted IPIndex; built on first use if none was given
+        self.index = index
+
+    def sorted_ips(self, d):
+        """The keys of d in IP order."""
+        if self.index is None:
+            self.index = IPIndex(self.ips)
+        return self.index.select(d)
 
     def greeting(self):
         """Prints a welcome banner."""
-        print("-" * 60)
-        print("Simple Nmap-Parser".center(60, " "))
-        print("Version 0.2.0".center(60, " "))
-        print("Tom Fieber (@tomfieber)".center(60, " "))
-        print("-" * 60)
+        print("-" * 60, file=self.console)
+        print("Simple Nmap-Parser".center(60, " "), file=self.console)
+        print("Version 0.2.0".center(60, " "), file=self.console)
+        print("Tom Fieber (@tomfieber)".center(60, " "), file=self.console)
+        print("-" * 60, file=self.console)
 
-    def split_banner(self, b):
-        """Takes a banner object from libnmap and splits it up.
+    def print_banner(self, parsed):
+        """Prints a parsed banner with one heading per line.
 
         Args:
-            b: The banner string you want to parse
+            parsed: The Banner stored on the service record
 
         Returns:
             Nothing
         """
-        banner = b.split()
-        firstword = banner[0]
-        lastword = banner[-1]
-        for word in banner:
-            if word.endswith(':'):
-                if word is firstword:
-                    print(word.capitalize(), end=" ")
-                else:
-                    print(f'\n{word.capitalize()}', end=" ")
-            elif word is lastword:
-                print(word)
-                print()
-            else:
-                print(word, end=" ")
+        lines = [f"{heading.capitalize()}: {value}"
+                 for heading, value in parsed.fields]
+        print(" \n".join(lines), file=self.console)
+        print(file=self.console)
 
-    def get_port_details(self, dict, file):
+    def get_port_details(self, record, file, details=True):
         """Gets the port details from the nmap results for each port.
 
         Args:
-            dict: The dictionary containing the port details.
+            record: The ServiceRecord containing the port details.
+            file: The file the port line is written to
+            details: Whether -p prints the banner to the console
 
         Returns:
             Nothing
         """
-        port = dict['port']
-        protocol = dict['protocol']
-        service = dict['service']
-        banner = dict['banner']
+        port = record.port
+        protocol = record.protocol
+        service = record.service
         file.write(f"[*] {port} ")
         file.write(f"{protocol} ")
         file.write(f"{service}\n")
-        if show_port_details:
-            try:
-                self.split_banner(banner)
-            except IndexError:
-                print("Product and version unknown")
-                print()
+        if show_port_details and details:
+            if record.parsed.fields:
+                self.print_banner(record.parsed)
+            else:
+                print("Product and version unknown", file=self.console)
+                print(file=self.console)
 
     def get_hostnames(self, ip):
         """Reads the hostnames associated with a given IP address
@@ -191,7 +429,7 @@ class DisplayAll(object):
             Nothing
         """
         hosts = []
-        for host in ips[ip]:
+        for host in self.ips[ip]:
             if host != "[-] No Hostname":
                 hosts.append(host)
         return hosts
@@ -199,22 +437,22 @@ class DisplayAll(object):
     def table_section_banner(self):
         """Prints the table section banner."""
         print(colored("Use this section to generate tables of".center(
-            60, " "), "grey", "on_yellow"))
+            60, " "), "grey", "on_yellow"), file=self.console)
         print(colored("ports and services enumerated during testing".center(
-            60, " "), "grey", "on_yellow"))
-        print()
+            60, " "), "grey", "on_yellow"), file=self.console)
+        print(file=self.console)
 
     def port_count_banner(self):
         """Prints the port count section banner"""
         print(colored("Count of all open ports across all hosts".center(
-            60, " "), "grey", "on_yellow"))
+            60, " "), "grey", "on_yellow"), file=self.console)
         print(colored("enumerated during testing".center(
-            60, " "), "grey", "on_yellow"))
-        print()
+            60, " "), "grey", "on_yellow"), file=self.console)
+        print(file=self.console)
 
     def header(self, h):
         """Prints a section header"""
-        print(colored(f"---{h}---", "magenta"))
+        print(colored(f"---{h}---", "magenta"), file=self.console)
 
     def print_dict(self, d):
         """Prints the contents of the given dictionary (Usually ports)
@@ -228,23 +466,91 @@ class DisplayAll(object):
         if not os.path.exists("./output/"):
             os.mkdir("./output/")
 
-        with open('./output/hosts.txt', 'w') as hosts_file:
-            for ipaddr in sorted(d.keys()):
-                hosts_file.write("="*20 + "\n")
-                hosts_file.write(f"[+] {ipaddr}\n")
-                hosts_file.write("\n")
-                hosts_file.write("---Hostnames---\n")
-                hosts = self.get_hostnames(ipaddr)
-                if len(hosts) > 0:
-                    for host in hosts:
-                        hosts_file.write(host + '\n')
-                else:
-                    hosts_file.write("There are no hostnames\n")
-                hosts_file.write("\n")
-                hosts_file.write("---Open Ports---\n")
-                for i in range(len(d[ipaddr])):
-                    self.get_port_details(d[ipaddr][i], hosts_file)
-                hosts_file.write('\n')
+        profiler = active_profiler()
+        with profiler.phase('output:hosts:sort'):
+            ips = self.sorted_ips(d)
+        with profiler.phase('output:hosts:write') as counts:
+            with open('./output/hosts.txt', 'w', buffering=WRITE_BUFFER) as hosts_file:
+                for ipaddr in ips:
+                    self.write_host(hosts_file, ipaddr, d[ipaddr])
+            counts['hosts'] = len(ips)
+
+    def print_subnets(self, d, prefix):
+        """Writes hosts.txt split into one file per subnet under ./output/hosts/.
+
+        Args:
+            d: The dictionary of ports to write, keyed on IP
+            prefix: The IPv4 prefix length to split on, e.g. 24
+
+        Returns:
+            Nothing
+        """
+        if not os.path.exists("./output/hosts/"):
+            os.mkdir("./output/hosts/")
+
+        if self.index is None:
+            self.index = IPIndex(self.ips)
+        keys = set(d.keys())
+        for subnet, subnet_ips in self.index.subnets(prefix):
+            hosts_file = io.StringIO()
+            for ipaddr in subnet_ips:
+                if ipaddr in keys:
+                    # The banners were already printed for hosts.txt
+                    self.write_host(hosts_file, ipaddr, d[ipaddr], details=False)
+            if hosts_file.tell():
+                name = subnet.replace('/', '_').replace(':', '-')
+                with open(f'./output/hosts/{name}.txt', 'w') as out:
+                    out.write(hosts_file.getvalue())
+
+    def print_sorted_hosts(self, entries):
+        """Writes hosts.txt from (ip, hostnames, records) entries already in order.
+
+        Used with --max-memory: the file is written as the entries arrive
+        instead of being built in memory first.
+
+        Args:
+            entries: An iterable of (ip, list of hostnames, ServiceRecords)
+
+        Returns:
+            Nothing
+        """
+        if not os.path.exists("./output/"):
+            os.mkdir("./output/")
+        with open('./output/hosts.txt', 'w', buffering=WRITE_BUFFER) as hosts_file:
+            for ipaddr, hostnames, records in entries:
+                self.write_host(hosts_file, ipaddr, records, hostnames)
+
+    def write_host(self, hosts_file, ipaddr, records, hostnames=None, details=True):
+        """Writes the hosts.txt section for a single IP address.
+
+        Args:
+            hosts_file: The open hosts.txt file
+            ipaddr: The IP address
+            records: The ServiceRecords of the open ports on this IP
+            hostnames: The IP's hostnames; looked up in self.ips if not given
+            details: Whether -p prints the port banners to the console
+
+        Returns:
+            Nothing
+        """
+        hosts_file.write("="*20 + "\n")
+        hosts_file.write(f"[+] {ipaddr}\n")
+        hosts_file.write("\n")
+        hosts_file.write("---Hostnames---\n")
+        if hostnames is None:
+            hosts = self.get_hostnames(ipaddr)
+        else:
+            hosts = [host for host in hostnames if host != "[-] No Hostname"]
+        if len(hosts) > 0:
+            for host in hosts:
+                hosts_file.write(host + '\n')
+        else:
+            hosts_file.write("There are no hostnames\n")
+        hosts_file.write("\n")
+        hosts_file.write("---Open Ports---\n")
+        for record in records:
+            self.get_port_details(record, hosts_file, details)
+        hosts_file.write('\n')
 
     def count_open_ports(self, pc):
         """Counts the total number of open ports across all hosts.
@@ -258,9 +564,9 @@ class DisplayAll(object):
         if not quiet:
             self.port_count_banner()
         else:
-            print(colored("---Count of All Open Ports---", "magenta"))
+            print(colored("---Count of All Open Ports---", "magenta"), file=self.console)
         for k in sorted(pc.keys(), key=int):
-            print(f"{k} : {pc[k]}")
+            print(f"{k} : {pc[k]}", file=self.console)
 
     def print_ips(self, ip_dict):
         """Prints out the IPs that are listed as UP.
@@ -271,10 +577,14 @@ class DisplayAll(object):
         Returns:
             Nothing
         """
-        print()
+        self.print_ip_list(self.sorted_ips(ip_dict))
+
+    def print_ip_list(self, ips):
+        """Prints the given IPs, in the order given, under the "UP" header."""
+        print(file=self.console)
         self.header('List of IPs That Are "UP"')
-        for ip in ip_dict.keys():
-            print(ip)
+        for ip in ips:
+            print(ip, file=self.console)
 
     def print_hosts(self, ip_dict):
         """Prints out the full list of enumerated hosts.
@@ -285,42 +595,377 @@ class DisplayAll(object):
         Returns:
             Nothing, but prints out all the enumerated hosts across all IPS.
         """
-        print()
+        self.print_host_list(ip_dict[ip] for ip in self.sorted_ips(ip_dict))
+
+    def print_host_list(self, hostname_lists):
+        """Prints every non-empty hostname from an iterable of hostname lists."""
+        print(file=self.console)
         self.header('List of All Hosts')
-        for ip in ip_dict.keys():
-            for host in ip_dict[ip]:
+        for hostnames in hostname_lists:
+            for host in hostnames:
                 if host != '':
-                    print(host)
+                    print(host, file=self.console)
 
     def print_all_services(self, services_dict):
         if not os.path.exists("./output/"):
             os.mkdir("./output/")
-        with open('./output/all-services.txt', 'w') as services:
-            services.write("---List of All Hosts by Service---\n\n")
-            for svc in services_dict.keys():
-                services.write(f"=== Service: {svc} ===\n")
-                for detail in services_dict[svc]['details']:
-                    ip, port, protocol = detail[0], detail[1], detail[2]
-                    services.write(f"{ip}:{port}/{protocol}\n")
-                services.write("\n\n")
+        profiler = active_profiler()
+        with profiler.phase('output:services:write') as counts:
+            with open('./output/all-services.txt', 'w', buffering=WRITE_BUFFER) as out:
+                self.write_services(out, ((svc, services_dict[svc]['details'])
+                                          for svc in services_dict.keys()))
+            counts['services'] = len(services_dict)
+
+    def print_sorted_services(self, groups):
+        """Writes all-services.txt from (service, records) groups as they arrive.
+
+        Used with --max-memory, where the groups come from a k-way merge.
+        """
+        if not os.path.exists("./output/"):
+            os.mkdir("./output/")
+        with open('./output/all-services.txt', 'w', buffering=WRITE_BUFFER) as out:
+            self.write_services(out, groups)
+
+    def write_services(self, out, groups):
+        """Writes the all-services.txt contents.
+
+        Args:
+            out: The file to write to
+            groups: An iterable of (service name, ServiceRecords)
+
+        Returns:
+            Nothing
+        """
+        out.write(SERVICES_HEADER)
+        for svc, records in groups:
+            self.write_service(out, svc, records)
+
+    def write_service(self, out, svc, records):
+        """Writes the all-services.txt section for a single service."""
+        out.write(f"=== Service: {svc} ===\n")
+        for record in records:
+            ip, port, protocol = record.ip, record.port, record.protocol
+            out.write(f"{ip}:{port}/{protocol}\n")
+        out.write("\n\n")
+
+
+@register_sink('hosts')
+class HostsSink(Sink):
+    def write(self, model):
+        display = DisplayAll(model.ips, model.ports, model.port_count, self.console,
+                             model.index)
+        if model.spill is not None:
+            display.print_sorted_hosts(model.spill.host_entries())
+            return
+        display.print_dict(model.ports)
+        if getattr(model.options, 'split_hosts', None):
+            display.print_subnets(model.ports, model.options.split_hosts)
+        self.counts['hosts'] = len(model.ports)
+
+
+@register_sink('ips')
+class IpsSink(Sink):
+    def write(self, model):
+        display = DisplayAll(model.ips, model.ports, model.port_count, self.console,
+                             model.index)
+        if model.spill is not None:
+            display.print_ip_list(ip for ip, _ in model.spill.ips())
+        else:
+            display.print_ips(model.ips)
+
+
+@register_sink('hostnames')
+class HostnamesSink(Sink):
+    def write(self, model):
+        display = DisplayAll(model.ips, model.ports, model.port_count, self.console,
+                             model.index)
+        if model.spill is not None:
+            display.print_host_list(hostnames for _, hostnames in model.spill.ips())
+        else:
+            display.print_hosts(model.ips)
+
+
+@register_sink('services')
+class ServicesSink(Sink):
+    def write(self, model):
+        display = DisplayAll(model.ips, model.ports, model.port_count, self.console,
+                             model.index)
+        print("[+] Writing services file", file=self.console)
+        if model.spill is not None:
+            display.print_sorted_services(model.spill.services())
+        else:
+            display.print_all_services(model.services)
+            self.counts['services'] = len(model.services)
+        print("[!] Done. Services file written to ./output/all-services.txt",
+              file=self.console)
+
+
+class BlockFile(object):
+    """A file made of one block per key, in the order the keys were first written.
+
+    Blocks of new keys are appended. When a key already in the file changes,
+    the file is cut at that key's block and only the blocks from there on
+    are written again.
+    """
+
+    def __init__(self, path, write_block, header=''):
+        self.path = path
+        self.write_block = write_block
+        self.keys = []
+        self.offsets = []
+        self.positions = {}
+        with open(path, 'w') as out:
+            out.write(header)
+
+    def update(self, changed):
+        """Writes the blocks of the changed keys, given in first seen order."""
+        first = min((self.positions[key] for key in changed if key in self.positions),
+                    default=len(self.keys))
+        with open(self.path, 'r+') as out:
+            if first < len(self.keys):
+                out.seek(self.offsets[first])
+                out.truncate()
+                keys = self.keys[first:]
+                del self.keys[first:], self.offsets[first:]
+            else:
+                out.seek(0, io.SEEK_END)
+                keys = []
+            keys += [key for key in changed if key not in self.positions]
+            for key in keys:
+                self.positions[key] = len(self.keys)
+                self.keys.append(key)
+                self.offsets.append(out.tell())
+                self.write_block(out, key)
+
+
+class FollowChanges(Reducer):
+    """Collects the IPs and services that got new ports since the last update.
+
+    Set as the changed dictionary of the HostnameIndex, ips also collects
+    the IPs that got new hostnames.
+    """
+
+    name = 'follow'
+
+    def __init__(self):
+        super().__init__()
+        self.ips = {}
+        self.services = {}
+        self.counts = False
+
+    def update(self, ip, record, new):
+        # Every open port is counted, but only new ones are listed
+        self.counts = True
+        if new:
+            self.ips[ip] = None
+            self.services[record.service] = None
+
+    def merge(self, other, kept=None):
+        self.ips.update(other.ips)
+        self.services.update(other.services)
+        self.counts = self.counts or other.counts
+
+    def take(self):
+        """The changes since the last call, as (ips, services, counts changed)."""
+        changes = list(self.ips), list(self.services), self.counts
+        # Cleared in place, the HostnameIndex keeps adding to the same dictionary
+        self.ips.clear()
+        self.services.clear()
+        self.counts = False
+        return changes
+
+
+class FollowOutput(object):
+    """Keeps ./output/ up to date while --follow parses a running scan.
+
+    The parser feeds every open port to the changes reducer, so each update
+    only looks at the IPs and services that got new ports (or hostnames)
+    since the last one. Their blocks are appended to hosts.txt and all-services.txt in the
+    order they are found, and a file is only partly rewritten when an IP or
+    service already in it gets more ports. The CSV, one line per port
+    number, is rewritten when any count changed.
+    """
+
+    def __init__(self, display, ports, port_count, services, outputs=OUTPUTS):
+        self.display = display
+        self.outputs = outputs
+        self.ports = ports
+        self.port_count = port_count
+        self.services = services
+        self.changes = FollowChanges()
+        display.ips.changed = self.changes.ips
+
+        if not os.path.exists("./output/"):
+            os.mkdir("./output/")
+        self.hosts_file = self.services_file = None
+        if 'hosts' in self.outputs:
+            self.hosts_file = BlockFile(
+                './output/hosts.txt',
+                lambda out, ip: self.display.write_host(out, ip, self.ports[ip]))
+        if 'services' in self.outputs:
+            self.services_file = BlockFile(
+                './output/all-services.txt',
+                lambda out, svc: self.display.write_service(
+                    out, svc, self.services[svc]['details']),
+                SERVICES_HEADER)
+
+    def update(self):
+        """Writes whatever changed since the last update."""
+        ips, services, counts = self.changes.take()
+        # Hosts without open ports aren't listed in hosts.txt
+        ips = [ip for ip in ips if ip in self.ports]
+        if self.hosts_file is not None and ips:
+            self.hosts_file.update(ips)
+        if self.services_file is not None and services:
+            self.services_file.update(services)
+        if 'csv' in self.outputs and counts:
+            exportCsv(self.port_count)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Make constructing the IP table easy')
     parser.add_argument('-f', '--file', dest='files', nargs='+',
-                        required=True, help='The file to parse')
+                        help='The file to parse')
     parser.add_argument('-q', '--quiet', dest='quiet', action='store_true',
                         help='Suppress the welcome banner and headlines')
     parser.add_argument('-v', '--verbose', dest='verbose', action='store_true',
                         help='List all ports with duplicates')
     parser.add_argument('-p', '--ports', dest='ports',
                         action='store_true', help='Show detailed port info')
+    parser.add_argument('-s', '--stream', dest='stream', action='store_true',
+                        help='Parse the XML host by host to keep memory flat')
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                        help='Worker processes for parsing XML/Dehashed files and building the appendix')
+    parser.add_argument('--cache-dir', dest='cache_dir', default='./output/.cache',
+                        help='Directory for cached parse results')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=1024,
+                        help='Maximum size of the parse cache in MB')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true',
+                        help='Parse every file again and skip the cache')
+    parser.add_argument('--db', dest='db',
+                        help='SQLite database to store the results in (CSV port counts '
+                             'then count each IP once per port)')
+    parser.add_argument('--follow', dest='follow', action='store_true',
+                        help='Follow an XML file nmap is still writing')
+    parser.add_argument('--query', dest='query',
+                        help='Query the --db database instead of writing outputs')
     parser.add_argument('-d', '--dehashed', dest='dehashed',
                         nargs='+', help='The dehashed JSON file(s) to parse')
+    parser.add_argument('--dump', dest='dump', action='store_true',
+                        help='Print the full parsed dictionaries')
+    parser.add_argument('--only', dest='only',
+                        help=f"Comma separated outputs to write ({','.join(OUTPUTS)})")
+    parser.add_argument('--max-memory', dest='max_memory', type=int, metavar='MB',
+                        help='Sort parsed records in temporary files past this budget')
+    parser.add_argument('--spill-dir', dest='spill_dir',
+                        help='Directory for the --max-memory run files')
+    parser.add_argument('--matrix', dest='matrix', action='store_true',
+                        help='Aggregate ports with a NumPy host x port matrix')
+    parser.add_argument('--profile', dest='profile', nargs='?', const='./output/metrics.json',
+                        help='Write per-phase timing and memory metrics to this JSON file')
+    parser.add_argument('--profile-dump', dest='profile_dump',
+                        help='Also write cProfile stats for every phase to this directory')
+    parser.add_argument('--hosts-with', dest='hosts_with',
+                        help='Print hosts with all these ports open, e.g. 22/tcp,80/tcp')
+    parser.add_argument('--split-hosts', dest='split_hosts', type=int, metavar='PREFIX',
+                        help='Also split hosts.txt into one file per subnet of this size')
+    parser.add_argument('--ips-for', dest='ips_for', metavar='HOSTNAME',
+                        help='Print the IPs a hostname was seen on')
+    parser.add_argument('--hosts-in', dest='hosts_in', metavar='CIDR',
+                        help='Print the hosts inside this range, e.g. 10.0.1.0/24')
+    parser.add_argument('--scan', dest='scan', metavar='TARGETS',
+                        help='TCP connect scan these IPs/CIDRs instead of reading XML')
+    parser.add_argument('--scan-ports', dest='scan_ports', default=None,
+                        help='Ports to scan, e.g. 22,80,8000-8100 (default: common ports)')
+    parser.add_argument('--scan-concurrency', dest='scan_concurrency', type=int, default=500,
+                        help='Connections in flight at once')
+    parser.add_argument('--scan-timeout', dest='scan_timeout', type=float, default=1.0,
+                        help='Seconds to wait for a connection')
+    parser.add_argument('--scan-rate', dest='scan_rate', type=float, default=0,
+                        help='Maximum connections per second to any one host (0: no limit)')
+    parser.add_argument('--scan-banners', dest='scan_banners', action='store_true',
+                        help='Read the greeting of open services as their banner')
+    parser.add_argument('--summaries', dest='summaries',
+                        help='Comma separated summaries to aggregate while parsing '
+                        f"({','.join(summary_names())})")
+    parser.add_argument('--serve', dest='serve', nargs='?', metavar='ADDRESS',
+                        const='127.0.0.1:8642',
+                        help='Serve JSON queries on this loopback HOST:PORT or unix socket')
+    parser.add_argument('--diff', dest='diff', nargs=2, metavar=('OLD', 'NEW'),
+                        help='Compare two scans and write the differences')
     options = parser.parse_args()
+    if not (options.files or options.db or options.dehashed or options.diff or options.scan
+            or options.serve):
+        parser.error("at least one file (-f), database (--db), Dehashed file (-d) "
+                     "or scan (--scan) is required")
+    if options.serve:
+        from Modules.queryServer import parse_address
+        if (options.db or options.follow or options.max_memory or options.scan or options.diff
+                or options.matrix or options.hosts_with or options.ips_for or options.hosts_in):
+            parser.error("--serve keeps the scan in memory and answers queries itself; it "
+                         "can't be combined with --db, --follow, --max-memory, --scan, --diff, "
+                         "--matrix, --hosts-with, --ips-for or --hosts-in")
+        if STDIN in (options.files or []):
+            parser.error("--serve can't read the scan from stdin")
+        try:
+            parse_address(options.serve)
+        except ValueError as e:
+            parser.error(f"--serve: {e}")
+    if options.scan:
+        if options.files or options.db or options.follow:
+            parser.error("--scan can't be combined with -f, --db or --follow")
+        from Modules.portScanner import DEFAULT_PORTS, parse_ports, parse_targets
+        options.scan_ports = options.scan_ports or DEFAULT_PORTS
+        try:
+            parse_targets(options.scan)
+            parse_ports(options.scan_ports)
+        except ValueError as e:
+            parser.error(f"--scan: {e}")
+    if options.query and not options.db:
+        parser.error("--query needs a database (--db)")
+    if options.follow and (len(options.files or []) != 1 or options.db):
+        parser.error("--follow takes exactly one file (-f) and no --db")
+    if STDIN in (options.files or []):
+        if options.files.count(STDIN) > 1 or options.follow:
+            parser.error("stdin (-f -) can be read once and can't be followed; use -s instead")
+        if options.jobs > 1:
+            parser.error("stdin (-f -) can't be parsed with --jobs")
+    outputs = options.only.split(',') if options.only else list(OUTPUTS)
+    unknown = [output for output in outputs if output not in OUTPUTS]
+    if unknown:
+        parser.error(f"unknown output(s) for --only: {', '.join(unknown)}")
+    options.summaries = options.summaries.split(',') if options.summaries else []
+    unknown = [name for name in options.summaries if name not in summary_names()]
+    if unknown:
+        parser.error(f"unknown summary(s) for --summaries: {', '.join(unknown)}")
+    if options.summaries and (options.db or options.max_memory):
+        parser.error("--summaries can't be used with --db or --max-memory")
+    if options.ips_for and (options.db or options.max_memory):
+        parser.error('--ips-for needs the in-memory model; with --db use --query "hostname NAME"')
+    if options.max_memory:
+        if not options.files or options.db or options.follow or options.scan:
+            parser.error("--max-memory needs XML files (-f) and no --db, --follow or --scan")
+        if options.matrix or options.hosts_with or options.hosts_in or options.split_hosts:
+            parser.error("--matrix, --hosts-with, --hosts-in and --split-hosts "
+                         "can't be used with --max-memory")
+        if options.only and 'appendix' in outputs:
+            parser.error("the appendix can't be written with --max-memory")
+        if 'appendix' in outputs:
+            outputs.remove('appendix')
+        # Spilling only bounds memory if the XML is streamed too
+        options.stream = True
+    if options.split_hosts is not None and not 0 <= options.split_hosts <= 32:
+        parser.error("--split-hosts takes an IPv4 prefix length between 0 and 32")
+    if options.hosts_with:
+        options.matrix = True
+        try:
+            wanted = [(port, protocol) for port, protocol in
+                      (key.strip().split('/') for key in options.hosts_with.split(','))]
+        except ValueError:
+            parser.error("--hosts-with takes port/protocol pairs, e.g. 22/tcp,80/tcp")
 
-    files = options.files
+    files = options.files or []
     quiet = options.quiet
     verbose = options.verbose
     show_port_details = options.ports
@@ -329,41 +974,176 @@ if __name__ == '__main__':
     base_dir = os.path.dirname(__file__)
     template_file = base_dir + "/Template/appendix.docx"
 
-    ips = {}
+    if options.serve:
+        from Modules.queryServer import QueryServer
+        server = QueryServer(options, template_file, parse_file, merge_dictionaries,
+                             [output for output in OUTPUTS if output in outputs])
+        server.run(options.serve)
+        sys.exit()
+
+    if options.profile:
+        profiler = Profiler(options.profile_dump)
+        # Written at exit so runs that stop early (e.g. --query) are covered
+        atexit.register(profiler.write, options.profile)
+    else:
+        profiler = NullProfiler()
+    set_active_profiler(profiler)
+
+    if options.diff:
+        from Modules.scanDiff import diff_scans, index_scan, write_diff
+        old_file, new_file = options.diff
+        with profiler.phase('diff') as counts:
+            diff = diff_scans(index_scan(old_file), index_scan(new_file))
+            write_diff(diff, old_file, new_file)
+            counts.update(added=len(diff.added), removed=len(diff.removed),
+                          changed=len(diff.changed))
+        print(f"[+] {len(diff.added_hosts)} new host(s), {len(diff.removed_hosts)} missing")
+        print(f"[+] {len(diff.added)} port(s) opened, {len(diff.removed)} closed, "
+              f"{len(diff.changed)} changed service(s)")
+        print("[!] Done. Diff written to ./output/scan-diff.txt, ./output/scan-diff.csv "
+              "and ./output/scan-diff.json")
+        sys.exit()
+
+    ips = HostnameIndex()
     ports = {}
-    port_count = {}
-    services = {}
+    reducers = Reducers(options.summaries)
+    port_count = reducers['port_count'].state
+    services = reducers['services'].state
     breached_creds = {}
-    cred_stuffing = []
-    password_spray = []
-
-    for file in files:
-        parsed = NParse(file, options)
-        parsed.populate_dictionaries(ips, ports, port_count, services)
-
-    if dehashed_files:
-        print("[+] Parsing Dehashed file(s)")
-        for dehashed_file in dehashed_files:
-            parsed_dehashed = ParseDehashed(
-                dehashed_file, options=options)
-            parsed_dehashed.parse_dehashed_json(
-                breached_creds, password_spray, cred_stuffing)
-
-    print(ips)
-    print(ports)
-    display = DisplayAll(ips, ports, port_count)
+    cred_stuffing = IndexedList()
+    password_spray = IndexedList()
+    spill = None
+
+    with profiler.phase('parse') as counts:
+        if options.db:
+            from Modules.scanStore import ScanStore
+            store = ScanStore(options.db)
+            for file in files:
+                NParse(file, options).populate_store(store)
+
+            if options.query:
+                try:
+                    results = store.query(options.query)
+                except ValueError as e:
+                    print(f"[-] {e}")
+                    sys.exit(1)
+                for record in results:
+                    print(f"{record.ip}:{record.port}/{record.protocol} {record.service} "
+                          f"{record.product} {record.version}")
+                print(f"[!] {len(results)} result(s)")
+                sys.exit()
+
+            ips = store.ips_view()
+            ports = store.ports_view()
+            port_count = store.port_count_view()
+            services = store.services_view()
+        elif options.scan:
+            parsed = NParse(options.scan, options)
+            try:
+                parsed.populate_dictionaries(ips, ports, reducers)
+            except OSError as e:
+                print(f"[-] --scan: {e.strerror}")
+                sys.exit(1)
+        elif options.max_memory:
+            from Modules.externalSort import SpilledScan
+            spill = SpilledScan(options.max_memory, verbose, options.spill_dir)
+            for file in files:
+                NParse(file, options).populate_spill(spill)
+            spill.finish()
+            port_count = spill.port_count.state
+        elif options.follow:
+            live = FollowOutput(DisplayAll(ips, ports, port_count),
+                                ports, port_count, services, outputs)
+            reducers.add(live.changes)
+            parsed = NParse(files[0], options, on_idle=live.update)
+            parsed.populate_dictionaries(ips, ports, reducers)
+        elif options.jobs > 1 and len(files) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=options.jobs) as executor:
+                for partial in executor.map(parse_file, files, [options] * len(files)):
+                    merge_dictionaries(partial, ips, ports, reducers, verbose)
+        elif not options.no_cache:
+            for file in files:
+                merge_dictionaries(parse_file(file, options), ips, ports, reducers, verbose)
+        else:
+            for file in files:
+                parsed = NParse(file, options)
+                parsed.populate_dictionaries(ips, ports, reducers)
+        if options.profile:
+            counts.update(files=len(files), hosts=len(ips),
+                          services=sum(len(records) for records in ports.values()))
+
+    if files and not (options.no_cache or options.db or options.follow or options.max_memory):
+        from Modules.parseCache import ParseCache
+        ParseCache(options.cache_dir, options.cache_size).evict()
+
+    # The Dehashed results only end up in the appendix
+    if dehashed_files and 'appendix' in outputs:
+        with profiler.phase('dehashed') as counts:
+            from Modules.parseDehashed import ParseDehashed, merge_dehashed, parse_dehashed_file
+            print("[+] Parsing Dehashed file(s)")
+            try:
+                if options.jobs > 1 and len(dehashed_files) > 1:
+                    from concurrent.futures import ProcessPoolExecutor
+                    with ProcessPoolExecutor(max_workers=options.jobs) as executor:
+                        for partial in executor.map(parse_dehashed_file, dehashed_files,
+                                                    [options] * len(dehashed_files)):
+                            merge_dehashed(partial, breached_creds,
+                                           password_spray, cred_stuffing)
+                else:
+                    for dehashed_file in dehashed_files:
+                        parsed_dehashed = ParseDehashed(
+                            dehashed_file, options=options)
+                        parsed_dehashed.parse_dehashed_json(
+                            breached_creds, password_spray, cred_stuffing)
+            except ValueError as e:
+                print(f"[-] {e}. Check your json file and try again.")
+                sys.exit(1)
+            counts.update(files=len(dehashed_files), credentials=len(breached_creds),
+                          usernames=len(password_spray), pairs=len(cred_stuffing))
+
+    matrix = None
+    if options.matrix:
+        try:
+            from Modules.portMatrix import PortMatrix
+        except ImportError:
+            print("[-] --matrix needs numpy (python3 -m pip install numpy)")
+            sys.exit(1)
+        with profiler.phase('matrix') as counts:
+            matrix = PortMatrix.from_ports(ports)
+            port_count = matrix.port_count()
+            counts.update(hosts=len(matrix.ips), ports=len(matrix.columns))
+        if options.hosts_with:
+            for ip in matrix.hosts_with(wanted):
+                print(ip)
+
+    index = IPIndex(ips)
+    if options.ips_for:
+        for ip in ips.ips_for(options.ips_for):
+            print(ip)
+    if options.hosts_in:
+        try:
+            for ip in index.in_network(options.hosts_in):
+                print(ip)
+        except ValueError as e:
+            print(f"[-] {e}")
+            sys.exit(1)
+
+    # With --max-memory the parse results live in run files, not the dictionaries
+    if options.dump and spill is None:
+        print(ips)
+        print(ports)
+    display = DisplayAll(ips, ports, port_count, index=index)
     if not quiet:
         display.greeting()
-    # Output appendix
-    document = Document(template_file)
-    appendix = AppendixGenerator(options)
-    appendix.export_doc(breached_creds, ips, ports, document)
-    display.print_dict(ports)
-    display.print_ips(ips)
-    display.print_hosts(ips)
-    print("[+] Writing listening services CSV file")
-    exportCsv(port_count)
-    print("[!] Done. Listening Services CSV written to ./output/listening-services.csv")
-    print("[+] Writing services file")
-    display.print_all_services(services)
-    print("[!] Done. Services file written to ./output/all-services.txt")
\ No newline at end of file
+
+    model = read_only_model(ips, ports, port_count, services, breached_creds, options,
+                            template_file, matrix, index, spill, reducers.summaries())
+    names = [output for output in OUTPUTS if output in outputs]
+    names += ['matrix'] if matrix is not None else []
+    names += ['summaries'] if model.summaries else []
+    with profiler.phase('outputs') as counts:
+        run_sinks(model, names, profiler)
+        counts.update(outputs=len(names))
+    if spill is not None:
+        spill.close()